@@ -0,0 +1,149 @@
+import asyncio
+import gzip
+import json
+import logging
+import secrets
+import time
+
+from instrumentation import metrics
+from prize_store import PrizeStore
+from storage import apply_record
+
+BACKUP_FORMAT = 'prizes-backup'
+
+
+def encode_payload(payload):
+    raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(raw)
+
+
+def encode_full(payload, rows, next_id):
+    # 在執行緒中把 rows() 的複本轉成 prizes_data.json 格式再編碼，事件迴圈上只需複製 ID 陣列
+    payload["data"] = PrizeStore.from_rows(rows, next_id).to_dict()
+    return encode_payload(payload)
+
+
+def decode_payload(data):
+    # 接受 gzip 壓縮或純文字 JSON（包含舊版 prizes_data.json）
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def is_backup_payload(payload):
+    return isinstance(payload, dict) and payload.get("format") == BACKUP_FORMAT
+
+
+def rebuild(payloads):
+    """由一份完整快照加上其後的增量備份重建資料，回傳 (PrizeStore, 版本, 已套用增量數)。"""
+    fulls = [p for p in payloads if p.get("kind") == "full"]
+    if not fulls:
+        raise ValueError("找不到完整快照備份")
+    # 版本號在重新啟動後會歸零，以建立時間挑選最新的完整快照
+    base = max(fulls, key=lambda p: (p.get("time", 0), p["version"]))
+    # 還原流程會把 data 直接串流成 PrizeStore
+    data = base["data"]
+    store = data if isinstance(data, PrizeStore) else PrizeStore.from_dict(data)
+    version = base["version"]
+    deltas = sorted(
+        (p for p in payloads if p.get("kind") == "delta" and p.get("chain") == base["chain"]),
+        key=lambda p: p["version"]
+    )
+    applied = 0
+    for delta in deltas:
+        if delta["version"] <= version:
+            continue
+        if delta["from"] != version:
+            # 增量鏈中斷，之後的增量無法安全套用
+            raise ValueError(f"缺少版本 {version} 到 {delta['from']} 之間的增量備份")
+        for record in delta["records"]:
+            apply_record(store, record)
+        version = delta["version"]
+        applied += 1
+    return store, version, applied
+
+
+class BackupScheduler:
+    """以 dirty 旗標與遞增版本號排程備份：每 N 個版本送一次完整快照，其餘只送增量。"""
+
+    def __init__(self, send, get_store, cooldown=60, full_every=20, label=None):
+        self.send = send                # async send(filename, data, caption)
+        self.label = label              # 分區名稱，加在檔名與說明中
+        self.get_store = get_store
+        self.cooldown = cooldown
+        self.full_every = full_every
+        self.version = 0                # 每次變更遞增
+        self.shipped_version = 0        # 最後一次成功送出的版本
+        self._chain = None              # 目前完整快照的鏈 ID，增量以此對應
+        self._since_full = 0
+        self._records = []
+        self._needs_full = True
+        self._last_sent = 0.0
+        self._dirty = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def mark_dirty(self, *records):
+        # records 為空代表整份資料被替換（上線、還原），下次必須送完整快照
+        self.version += 1
+        if records:
+            self._records.extend(records)
+        else:
+            self._needs_full = True
+        self._dirty.set()
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            wait_time = self.cooldown - (time.monotonic() - self._last_sent)
+            if wait_time > 0:
+                logging.debug("備份冷卻中，等待 %.2f 秒", wait_time)
+                await asyncio.sleep(wait_time)
+            with metrics.timer("backup"):
+                await self._ship()
+
+    async def _ship(self):
+        # 取走目前累積的變更；送出前若又有新變更會在下一輪送出，永遠會送到最新版本
+        self._dirty.clear()
+        version = self.version
+        records = self._records
+        self._records = []
+        full = self._needs_full or self._chain is None or self._since_full >= self.full_every
+        self._needs_full = False
+        if full:
+            chain = secrets.token_hex(4)
+            store = self.get_store()
+            rows, next_id = store.rows(), store.next_id
+            payload = {"format": BACKUP_FORMAT, "kind": "full", "chain": chain, "partition": self.label,
+                       "version": version, "time": time.time()}
+        else:
+            payload = {"format": BACKUP_FORMAT, "kind": "delta", "chain": self._chain, "partition": self.label,
+                       "from": self.shipped_version, "version": version, "records": records}
+        prefix = f"prizes_backup_{self.label}" if self.label else "prizes_backup"
+        filename = f"{prefix}_v{version}_{'full' if full else 'delta'}.json.gz"
+        self._last_sent = time.monotonic()
+        try:
+            if full:
+                data = await asyncio.to_thread(encode_full, payload, rows, next_id)
+            else:
+                data = await asyncio.to_thread(encode_payload, payload)
+            scope = f" [{self.label}]" if self.label else ""
+            await self.send(filename, data, f"自動備份{scope} v{version}（{'完整' if full else f'增量 {len(records)} 筆'}）")
+        except Exception as e:
+            logging.error("備份失敗：%s", e)
+            # 放回佇列，冷卻後重試
+            self._records[:0] = records
+            self._needs_full = self._needs_full or full
+            self._dirty.set()
+            return False
+        if full:
+            self._chain = chain
+            self._since_full = 0
+        else:
+            self._since_full += 1
+        self.shipped_version = version
+        logging.debug("已送出備份 %s，大小 %s bytes", filename, len(data))
+        return True
@@ -0,0 +1,187 @@
+"""不連線 Discord 的替身物件，只實作 draw_bot.py 實際用到的屬性與方法。"""
+
+import io
+import itertools
+import os
+
+_ids = itertools.count(10 ** 17)
+
+
+def snowflake():
+    return next(_ids)
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embeds=(), view=None, file=None):
+        self.id = snowflake()
+        self.channel = channel
+        self.content = content
+        self.embeds = list(embeds)
+        self.view = view
+        self.file = file
+
+    async def edit(self, *, content=None, embed=None, view=None, **kwargs):
+        self.channel.edits += 1
+        if embed is not None:
+            self.embeds = [embed]
+        if view is not None:
+            self.view = view
+        return self
+
+
+class FakeChannel:
+    """記錄送出的訊息數與字元數，不保留訊息本身以免影響記憶體量測。"""
+
+    def __init__(self, channel_id=None):
+        self.id = channel_id or snowflake()
+        self.sent = 0
+        self.chars = 0
+        self.edits = 0
+        self.file_bytes = 0
+
+    async def send(self, content=None, *, embed=None, embeds=None, view=None, file=None, **kwargs):
+        embeds = [embed] if embed is not None else list(embeds or ())
+        self.sent += 1
+        self.chars += len(content or "") + sum(len(e) for e in embeds)
+        if file is not None:
+            self.file_bytes += os.fstat(file.fp.fileno()).st_size
+        return FakeMessage(self, content, embeds, view, file)
+
+
+class FakeMember:
+    __slots__ = ('id', 'name', 'display_name', 'guild')
+
+    def __init__(self, member_id, name, guild):
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.guild = guild
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    async def send(self, *args, **kwargs):
+        return None
+
+
+class FakeGuild:
+    def __init__(self, member_count=0, guild_id=None):
+        self.id = guild_id or snowflake()
+        self.name = f"bench-{self.id}"
+        self.chunked = True
+        self.shard_id = 0
+        self.filesize_limit = 25 * 1024 * 1024
+        self._members = {}
+        for i in range(member_count):
+            self.add_member(f"user{i}")
+
+    def add_member(self, name):
+        member = FakeMember(snowflake(), name, self)
+        self._members[member.id] = member
+        return member
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    @property
+    def member_ids(self):
+        return list(self._members)
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+    def get_channel(self, channel_id):
+        return None
+
+    async def chunk(self, cache=True):
+        return self.members
+
+    async def query_members(self, user_ids=None, limit=5, cache=True):
+        return [self._members[i] for i in user_ids if i in self._members][:limit]
+
+
+class FakeAttachment:
+    def __init__(self, filename, data, url=None):
+        self.filename = filename
+        self.size = len(data)
+        self.url = url  # !restore 以串流方式下載，由 benchmarks.run 的本機 HTTP 伺服器提供
+        self._data = data
+
+    async def read(self):
+        return self._data
+
+    async def save(self, fp, *, seek_begin=True):
+        if isinstance(fp, (str, bytes)):
+            with open(fp, 'wb') as f:
+                return f.write(self._data)
+        written = fp.write(self._data)
+        if seek_begin:
+            fp.seek(0)
+        return written
+
+    def open(self):
+        return io.BytesIO(self._data)
+
+
+class FakeCommandMessage:
+    def __init__(self, attachments=()):
+        self.id = snowflake()
+        self.attachments = list(attachments)
+
+
+class FakeContext:
+    def __init__(self, guild, channel, author, attachments=()):
+        self.guild = guild
+        self.channel = channel
+        self.author = author
+        self.message = FakeCommandMessage(attachments)
+        self.command = None
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self._interaction.responses += 1
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self._interaction.responses += 1
+
+    async def send_modal(self, modal):
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self._interaction.responses += 1
+        return FakeMessage(self._interaction.channel, content)
+
+
+class FakeInteraction:
+    def __init__(self, guild, channel, user):
+        self.id = snowflake()
+        self.token = f"token-{self.id}"
+        self.guild = guild
+        self.channel = channel
+        self.user = user
+        self.responses = 0
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
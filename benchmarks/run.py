@@ -0,0 +1,395 @@
+"""draw_bot.py 的離線效能測試：以替身物件驅動真正的指令與按鈕 callback。
+
+用法（在專案根目錄）：
+    python -m benchmarks.run --scenario all --output bench.json
+
+輸出為 JSON，可直接與其他版本的結果比較。
+"""
+
+import argparse
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import web
+
+from benchmarks.fakes import FakeAttachment, FakeChannel, FakeContext, FakeGuild, FakeInteraction, FakeMember, snowflake
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    last = len(ordered) - 1
+    pick = lambda q: ordered[min(last, int(q * len(ordered)))] * 1000
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+
+class LoopMonitor:
+    """每 interval 秒醒來一次，量測事件迴圈的延遲（醒來時間比預期晚多少）。"""
+
+    def __init__(self, interval=0.005, threshold=0.010):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_stall = 0.0
+        self.total_stall = 0.0
+        self.stalls = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            late = time.perf_counter() - expected
+            self.max_stall = max(self.max_stall, late)
+            if late >= self.threshold:
+                self.stalls += 1
+                self.total_stall += late
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def report(self):
+        return {
+            "loop_max_stall_ms": self.max_stall * 1000,
+            "loop_total_stall_ms": self.total_stall * 1000,
+            "loop_stalls": self.stalls,
+        }
+
+
+class Bench:
+    def __init__(self, bot_module, args):
+        self.bot = bot_module
+        self.args = args
+        self.admin = FakeMember(snowflake(), "admin", None)
+
+    async def new_partition(self, member_count=0):
+        guild = FakeGuild(member_count)
+        channel = FakeChannel()
+        partition = await self.bot.partitions.get(guild.id)
+        # 只啟動保存 worker；自動備份需要真正的 DM，不在測試範圍
+        partition.persistence.start()
+        return guild, channel, partition
+
+    async def seed(self, partition, prizes):
+        """prizes 為 [(名稱, 得獎人數, 參加者 ID)]；與指令相同，改動記憶體資料並以紀錄保存，SQLite 模式下資料庫才有內容。"""
+        store = partition.store
+        for name, winners, user_ids in prizes:
+            prize = store.add(name, winners)
+            records = [{"op": "add", "prize": name, "winners": winners, "id": prize.id}]
+            for user_id in user_ids:
+                store.join(name, user_id)
+                records.append({"op": "join", "prize": name, "user": user_id})
+            partition.save(*records)
+        await partition.persistence.flush()
+
+    def context(self, guild, channel, attachments=()):
+        return FakeContext(guild, channel, self.admin, attachments)
+
+    async def joins(self):
+        rate = self.args.join_rate
+        duration = self.args.join_seconds
+        guild, channel, partition = await self.new_partition()
+        names = [f"prize{i}" for i in range(self.args.join_prizes)]
+        await self.seed(partition, [(name, 1, ()) for name in names])
+        # 先發出獎品清單，量測加入期間為了更新參加人數而產生的訊息編輯數
+        await self.bot.show_prizes.callback(self.context(guild, channel))
+        menus_before = self.bot.live_menus.stats()
+        buttons = [self.bot.PrizeJoinButton(partition, partition.store[name].id, name) for name in names]
+        # --join-users 大於 0 時由固定的一群使用者反覆點擊，用來量測頻率限制
+        users = [FakeMember(snowflake(), "u", guild) for _ in range(self.args.join_users)]
+        throttled_before = self.bot.action_limiter.throttled
+        latencies = []
+
+        async def click(button, user):
+            start = time.perf_counter()
+            await button.callback(FakeInteraction(guild, channel, user))
+            latencies.append(time.perf_counter() - start)
+
+        tick = 0.01
+        per_tick = max(1, int(rate * tick))
+        total = int(rate * duration)
+        tasks = []
+        start = time.perf_counter()
+        sent = 0
+        while sent < total:
+            deadline = start + (sent // per_tick + 1) * tick
+            for _ in range(min(per_tick, total - sent)):
+                user = random.choice(users) if users else FakeMember(snowflake(), "u", guild)
+                tasks.append(asyncio.ensure_future(click(random.choice(buttons), user)))
+                sent += 1
+            await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        flush_start = time.perf_counter()
+        await partition.persistence.flush()
+        menus = self.bot.live_menus.stats()
+        return {
+            "clicks": total,
+            "offered_rate": rate,
+            "throughput_per_s": total / elapsed,
+            "latency_ms": percentiles(latencies),
+            "final_flush_ms": (time.perf_counter() - flush_start) * 1000,
+            "throttled": self.bot.action_limiter.throttled - throttled_before,
+            "menu_messages": channel.sent,
+            "menu_edits": channel.edits + menus["pending"],
+            "menu_updates_coalesced": menus["coalesced"] - menus_before["coalesced"],
+        }
+
+    async def show_prizes(self):
+        guild, channel, partition = await self.new_partition()
+        await self.seed(partition, [
+            (f"prize{i}", 1 + i % 5, [snowflake() for _ in range(i % 20)])
+            for i in range(self.args.show_prizes)
+        ])
+        latencies = []
+        for _ in range(self.args.repeat):
+            ctx = self.context(guild, channel)
+            start = time.perf_counter()
+            await self.bot.show_prizes.callback(ctx)
+            latencies.append(time.perf_counter() - start)
+        return {
+            "prizes": self.args.show_prizes,
+            "runs": self.args.repeat,
+            "messages_per_run": channel.sent / self.args.repeat,
+            "throughput_per_s": self.args.repeat / sum(latencies),
+            "latency_ms": percentiles(latencies),
+        }
+
+    async def draw(self):
+        prizes = self.args.draw_prizes
+        per_prize = self.args.draw_entries // prizes
+        latencies = []
+        for run in range(self.args.repeat):
+            guild, channel, partition = await self.new_partition(self.args.draw_members)
+            await self.bot.member_cache.prime(guild)
+            member_ids = guild.member_ids
+            rng = random.Random(run)
+            await self.seed(partition, [
+                (f"prize{i}", self.args.draw_winners, rng.sample(member_ids, min(per_prize, len(member_ids))))
+                for i in range(prizes)
+            ])
+            ctx = self.context(guild, channel)
+            start = time.perf_counter()
+            await self.bot.draw.callback(ctx, self.args.draw_mode, seed=run)
+            latencies.append(time.perf_counter() - start)
+            await partition.persistence.flush()
+        select = self.bot.metrics.histograms.get("draw.select")
+        return {
+            "prizes": prizes,
+            "mode": self.args.draw_mode or "independent",
+            "total_entries": per_prize * prizes,
+            "runs": self.args.repeat,
+            "entries_per_s": per_prize * prizes * self.args.repeat / sum(latencies),
+            "latency_ms": percentiles(latencies),
+            "select_ms": percentiles(list(select.samples)) if select else None,
+        }
+
+    async def export(self):
+        prizes = self.args.export_prizes
+        per_prize = self.args.export_entries // prizes
+        guild, channel, partition = await self.new_partition(self.args.export_members)
+        await self.bot.member_cache.prime(guild)
+        member_ids = guild.member_ids
+        rng = random.Random(0)
+        await self.seed(partition, [
+            (f"prize{i}", 1, rng.sample(member_ids, min(per_prize, len(member_ids))))
+            for i in range(prizes)
+        ])
+        latencies = []
+        for _ in range(self.args.repeat):
+            ctx = self.context(guild, channel)
+            start = time.perf_counter()
+            await self.bot.export_lists.callback(ctx, self.args.export_format)
+            latencies.append(time.perf_counter() - start)
+        return {
+            "format": self.args.export_format,
+            "total_entries": per_prize * prizes,
+            "runs": self.args.repeat,
+            "file_mb": channel.file_bytes / self.args.repeat / 1024 / 1024,
+            "entries_per_s": per_prize * prizes * self.args.repeat / sum(latencies),
+            "latency_ms": percentiles(latencies),
+        }
+
+    def restore_payload(self):
+        # 產生約 restore_mb MB 的 prizes_data.json
+        target = self.args.restore_mb * 1024 * 1024
+        data = {}
+        size = 0
+        i = 0
+        while size < target:
+            participants = [str(snowflake()) for _ in range(1000)]
+            data[f"prize{i}"] = {"participants": participants, "winners": 1}
+            size += 24 * len(participants)
+            i += 1
+        raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if self.args.restore_gzip:
+            return "prizes_data.json.gz", gzip.compress(raw), len(raw)
+        return "prizes_data.json", raw, len(raw)
+
+    async def serve(self, filename, payload):
+        # 以本機 HTTP 伺服器提供附件，讓 !restore 走真正的串流下載
+        async def handler(request):
+            return web.Response(body=payload)
+
+        app = web.Application()
+        app.router.add_get(f"/{filename}", handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return runner, f"http://127.0.0.1:{port}/{filename}"
+
+    async def restore(self):
+        filename, payload, raw_size = self.restore_payload()
+        runner, url = await self.serve(filename, payload)
+        latencies = []
+        try:
+            for _ in range(self.args.repeat):
+                guild, channel, partition = await self.new_partition()
+                ctx = self.context(guild, channel, [FakeAttachment(filename, payload, url)])
+                start = time.perf_counter()
+                await self.bot.restore.callback(ctx, self.args.restore_mode)
+                latencies.append(time.perf_counter() - start)
+        finally:
+            await runner.cleanup()
+        return {
+            "file": filename,
+            "mode": self.args.restore_mode,
+            "file_mb": len(payload) / 1024 / 1024,
+            "json_mb": raw_size / 1024 / 1024,
+            "runs": self.args.repeat,
+            "mb_per_s": raw_size / 1024 / 1024 * self.args.repeat / sum(latencies),
+            "latency_ms": percentiles(latencies),
+        }
+
+
+SCENARIOS = ("joins", "show_prizes", "draw", "export", "restore")
+
+
+def unlimited_outbound(bot_module):
+    # 預設不模擬 Discord 限流，只量測 bot 本身的成本
+    from outbound import TokenBucket
+    outbound = bot_module.outbound
+    outbound.route_limits = {kind: (10 ** 9, 1.0) for kind in outbound.route_limits}
+    outbound.global_bucket = TokenBucket(10 ** 9, 1.0)
+    outbound._buckets.clear()
+
+
+def git_version():
+    try:
+        return subprocess.run(
+            ["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_bot(args):
+    # draw_bot 在匯入時檢查環境變數並建立儲存；在暫存目錄中匯入，避免動到真正的資料檔
+    os.environ.setdefault('TOKEN', 'benchmark')
+    os.environ.setdefault('BACKUP_USER_ID', '0')
+    os.environ['STORAGE_MODE'] = args.storage
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, ROOT)
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix='draw_bot_bench_'))
+    return importlib.import_module('draw_bot')
+
+
+async def run_all(args):
+    bot_module = load_bot(args)
+    if not args.real_limits:
+        unlimited_outbound(bot_module)
+    bench = Bench(bot_module, args)
+    names = SCENARIOS if args.scenario == 'all' else [args.scenario]
+    results = {}
+    for name in names:
+        if args.tracemalloc:
+            tracemalloc.start()
+        with LoopMonitor() as monitor:
+            start = time.perf_counter()
+            result = await getattr(bench, name)()
+            result["wall_s"] = time.perf_counter() - start
+        result.update(monitor.report())
+        if args.tracemalloc:
+            result["peak_heap_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+        # ru_maxrss 為整個行程的峰值（Linux 單位 KB），依執行順序遞增
+        result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        results[name] = result
+        print(f"{name}: {json.dumps(result, ensure_ascii=False)}", file=sys.stderr)
+    return {
+        "meta": {
+            "version": git_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "real_limits": args.real_limits,
+            "time": time.time(),
+        },
+        "scenarios": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--storage', choices=('json', 'journal', 'sqlite'), default='json')
+    parser.add_argument('--output', help="結果 JSON 的輸出檔（預設輸出到 stdout）")
+    parser.add_argument('--workdir', help="資料檔的暫存目錄（預設自動建立）")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--real-limits', action='store_true', help="保留 outbound 排程器的 Discord 限流設定")
+    parser.add_argument('--tracemalloc', action='store_true', help="以 tracemalloc 量測各情境的 Python 堆積峰值（較慢）")
+    parser.add_argument('--join-rate', type=int, default=10000)
+    parser.add_argument('--join-seconds', type=float, default=2.0)
+    parser.add_argument('--join-prizes', type=int, default=100)
+    parser.add_argument('--join-users', type=int, default=0, help="固定的點擊使用者數（0 為每次點擊都是新使用者）")
+    parser.add_argument('--show-prizes', type=int, default=500)
+    parser.add_argument('--draw-prizes', type=int, default=1000)
+    parser.add_argument('--draw-entries', type=int, default=1_000_000)
+    parser.add_argument('--draw-members', type=int, default=50_000)
+    parser.add_argument('--draw-winners', type=int, default=5)
+    parser.add_argument('--draw-mode', choices=('unique',), default=None, help="以 !draw unique 抽獎")
+    parser.add_argument('--export-prizes', type=int, default=100)
+    parser.add_argument('--export-entries', type=int, default=1_000_000)
+    parser.add_argument('--export-members', type=int, default=50_000)
+    parser.add_argument('--export-format', choices=('csv', 'jsonl'), default='csv')
+    parser.add_argument('--restore-mb', type=int, default=50)
+    parser.add_argument('--restore-gzip', action='store_true')
+    parser.add_argument('--restore-mode', choices=('replace', 'merge', 'dry-run'), default='replace')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 匯入 draw_bot 前會切換到暫存目錄，先把輸出路徑固定下來
+    output = os.path.abspath(args.output) if args.output else None
+    report = asyncio.run(run_all(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
 import discord
 from discord.ext import commands
-from discord.ui import View, Button
+from discord.ui import View, Button, Select, DynamicItem
 import random
-import json
+import re
 import os
 from dotenv import load_dotenv
 import logging
@@ -11,12 +11,41 @@ import keep_alive
 import asyncio
 import time
 import datetime
+import io
 import pytz
+from typing import Literal, Optional
+from prize_store import PrizeStore
+import storage
+import restore as restores
+import export as exports
+from partitions import PartitionManager
+from scheduler import PrizeScheduler, parse_when
+from live_menus import LiveMenus
+from throttle import SlidingWindowLimiter
+import draw_engine
+from member_cache import MemberCache, display_name
+from embed_pager import EmbedPager
+from outbound import OutboundScheduler, LANE_INTERACTIVE, LANE_NORMAL, LANE_BULK
+from instrumentation import configure_logging, metrics
 
+# 啟動時間起點，on_ready 第一次觸發時回報啟動耗時
+STARTUP_BEGAN = time.monotonic()
 load_dotenv()
+# 設置日誌（LOG_LEVEL 環境變數，預設 INFO）
+configure_logging()
 TOKEN = os.getenv('TOKEN')
 BACKUP_USER_ID = os.getenv('BACKUP_USER_ID')
 TIMEZONE = os.getenv('TIMEZONE', 'Asia/Hong_Kong')
+# json：每次保存重寫整個快照；journal：每次變更只附加一筆日誌紀錄；sqlite：單列寫入的資料庫
+STORAGE_MODE = os.getenv('STORAGE_MODE', 'json')
+# 快照檔格式（json / journal 模式）：binary 為精簡的 prizes_data.snap，json 為 prizes_data.json；兩種都能讀取
+SNAPSHOT_FORMAT = os.getenv('SNAPSHOT_FORMAT', 'binary')
+JOURNAL_COMPACT_INTERVAL = int(os.getenv('JOURNAL_COMPACT_INTERVAL', '300'))
+# 合併寫入：第一筆變更後最多等待秒數 / 累積筆數上限
+SAVE_MAX_DELAY = float(os.getenv('SAVE_MAX_DELAY', '1.0'))
+SAVE_MAX_BATCH = int(os.getenv('SAVE_MAX_BATCH', '500'))
+# 分區化之前的 prizes_data.json 要遷移到哪個伺服器（未設定時由第一個載入的伺服器接收）
+LEGACY_GUILD_ID = os.getenv('LEGACY_GUILD_ID')
 
 if not TOKEN:
     print("❌ 錯誤：找不到 TOKEN 環境變數")
@@ -28,254 +57,641 @@ if not BACKUP_USER_ID:
 print(f"✅ Token 已安全載入")
 print(f"✅ Backup User ID 已載入: {BACKUP_USER_ID}")
 print(f"✅ Time Zone: {TIMEZONE}")
+print(f"✅ Storage Mode: {STORAGE_MODE}")
+print(f"✅ Snapshot Format: {SNAPSHOT_FORMAT}")
 
-# Global cooldown tracker
-last_backup_time = 0
+# 備份冷卻秒數；每 BACKUP_FULL_EVERY 次備份送一次完整快照，其餘送增量
 BACKUP_COOLDOWN = 60
-backup_lock = asyncio.Lock()  # Lock to serialize backup tasks
-backup_pending = False  # Flag to track pending backup
+BACKUP_FULL_EVERY = int(os.getenv('BACKUP_FULL_EVERY', '20'))
+# 成員快取：每個伺服器最多保存筆數 / 存活秒數
+MEMBER_CACHE_SIZE = int(os.getenv('MEMBER_CACHE_SIZE', '50000'))
+MEMBER_CACHE_TTL = float(os.getenv('MEMBER_CACHE_TTL', '600'))
+# 參加者瀏覽器：每頁最多顯示的參加者數 / 獎品數，渲染後的頁面快取秒數
+PARTICIPANT_PAGE_ENTRIES = 30
+PARTICIPANT_PAGE_PRIZES = 10
+PARTICIPANT_PAGE_CACHE_TTL = float(os.getenv('PARTICIPANT_PAGE_CACHE_TTL', '30'))
+# !show_prizes 每頁最多的獎品數（受 View 元件數量限制）
+PRIZES_PER_PAGE = 15
+# 加入 / 退出的頻率限制：每位使用者在任意 ACTION_WINDOW 秒內最多 ACTION_LIMIT 次操作
+ACTION_LIMIT = int(os.getenv('ACTION_LIMIT', '10'))
+ACTION_WINDOW = float(os.getenv('ACTION_WINDOW', '10'))
+# 活動 ID 長度上限（會寫進元件的 custom_id）
+MAX_EVENT_ID = 64
+# 已發出的獎品清單：每則訊息更新參加人數的最短間隔秒數 / 最多追蹤的訊息數
+LIVE_MENU_INTERVAL = float(os.getenv('LIVE_MENU_INTERVAL', '5'))
+LIVE_MENU_MAX = int(os.getenv('LIVE_MENU_MAX', '500'))
+# !add_prize 的排程選項，例如 close=30m、draw=2026-01-01 20:00
+SCHEDULE_OPTION = re.compile(r'\b(close|draw)=(\d{4}-\d{2}-\d{2}[ T]\d{1,2}:\d{2}|[^\s,]+)')
 
 
-# 初始化 prizes 變量 - 確保是乾淨的字典
-prizes_data = {}  # 改名避免衝突
 
-# 載入之前的資料
-def load_prizes():
-    global prizes_data
-    if os.path.exists('prizes_data.json'):
-        try:
-            with open('prizes_data.json', 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
-                # 嚴格驗證資料格式
-                prizes_data = {}
-                for name, data in loaded_data.items():
-                    if (isinstance(name, str) and 
-                        isinstance(data, dict) and 
-                        "participants" in data and 
-                        "winners" in data and
-                        isinstance(data["participants"], list) and
-                        isinstance(data["winners"], int)):
-                        prizes_data[name] = {
-                            "participants": data["participants"],
-                            "winners": data["winners"]
-                        }
-                print(f"✅ 已載入 {len(prizes_data)} 個獎品資料")
-        except Exception as e:
-            print(f"❌ 載入資料失敗: {e}")
-            prizes_data = {}
-            print("ℹ️ 已重置為空資料")
-    else:
-        print("ℹ️ 沒有找到之前的資料，從頭開始")
+async def send_backup_to_user(filename, data, caption):
+    user = await outbound.run(("users",), lambda: bot.fetch_user(int(BACKUP_USER_ID)), LANE_BULK)
+    if not user:
+        raise RuntimeError(f"找不到用戶 ID {BACKUP_USER_ID}")
 
+    # Get current time in specified time zone
+    try:
+        timestamp = datetime.datetime.now(pytz.timezone(TIMEZONE)).strftime('%Y-%m-%d %H:%M:%S %Z')
+    except pytz.exceptions.UnknownTimeZoneError:
+        logging.error("無效的時區設定: %s", TIMEZONE)
+        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    try:
+        await outbound.run(
+            ("dm", user.id),
+            lambda: user.send(f"📤 {caption} ({timestamp})", file=discord.File(io.BytesIO(data), filename)),
+            LANE_BULK
+        )
+    except discord.errors.Forbidden:
+        raise RuntimeError(f"無法向用戶 {BACKUP_USER_ID} 發送 DM（可能被封鎖或未啟用 DM）")
+    logging.debug("成功發送備份到用戶 %s", BACKUP_USER_ID)
 
+def get_timezone():
+    try:
+        return pytz.timezone(TIMEZONE)
+    except pytz.exceptions.UnknownTimeZoneError:
+        logging.error("無效的時區設定: %s", TIMEZONE)
+        return pytz.utc
 
-async def send_backup_to_user():
-    global last_backup_time, backup_pending
-    async with backup_lock:  # Ensure only one backup task runs at a time
-        if backup_pending:
-            logging.debug("已有備份任務在等待，跳過重複調用")
-            return
-        
-        backup_pending = True
-        try:
-            # Calculate time since last backup
-            current_time = time.time()
-            time_since_last_backup = current_time - last_backup_time
-            
-            # Wait if within cooldown
-            if time_since_last_backup < BACKUP_COOLDOWN:
-                wait_time = BACKUP_COOLDOWN - time_since_last_backup
-                logging.debug(f"備份冷卻中，等待 {wait_time:.2f} 秒")
-                await asyncio.sleep(wait_time)
-            
-            # Update last backup time
-            last_backup_time = time.time()
-            
-            json_path = 'prizes_data.json'
-            if not os.path.exists(json_path):
-                logging.error("備份失敗：prizes_data.json 不存在")
-                return
-            
-            user = await bot.fetch_user(int(BACKUP_USER_ID))
-            if not user:
-                logging.error(f"備份失敗：找不到用戶 ID {BACKUP_USER_ID}")
-                return
-
-            # Get current time in specified time zone
-            tz = pytz.timezone(TIMEZONE)
-            timestamp = datetime.datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S %Z')
-            
-            # Send file via DM with timestamp
-            with open(json_path, 'rb') as f:
-                await user.send(f"📤 自動備份 prizes_data.json ({timestamp})", 
-                              file=discord.File(f, 'prizes_data_backup.json'))
-            logging.debug(f"成功發送備份到用戶 {BACKUP_USER_ID}")
-        except discord.errors.Forbidden:
-            logging.error(f"備份失敗：無法向用戶 {BACKUP_USER_ID} 發送 DM（可能被封鎖或未啟用 DM）")
-        except pytz.exceptions.UnknownTimeZoneError:
-            logging.error(f"無效的時區設定: {TIMEZONE}")
-        except Exception as e:
-            logging.error(f"備份失敗：{e}")
-        finally:
-            backup_pending = False  # Reset flag after task completes
+async def announce_close(partition, channel_id, names):
+    channel = bot.get_channel(channel_id) if channel_id else None
+    if channel is None:
+        logging.warning("[%s] 找不到頻道 %s，略過截止公告：%s", partition.label, channel_id, names)
+        return
+    await send(channel, "🔒 以下獎品報名已截止：" + "、".join(names), lane=LANE_BULK)
+
+async def scheduled_draw(partition, channel_id, names):
+    # 同一時間到期的獎品合併成一次抽獎、一則結果
+    result = await run_draw(partition, names)
+    if result is None:
+        return
+    channel = bot.get_channel(channel_id) if channel_id else None
+    if channel is None:
+        logging.warning("[%s] 找不到頻道 %s，抽獎結果未公告（種子 %s）", partition.label, channel_id, result.seed)
+        return
+    await send_draw_results(channel, result)
 
+# 定時截止與自動抽獎，所有分區共用一個背景工作
+prize_scheduler = PrizeScheduler(announce_close, scheduled_draw)
 
+# !show_prizes 發出的訊息，參加人數變更時合併後就地編輯
+live_menus = LiveMenus(interval=LIVE_MENU_INTERVAL, max_messages=LIVE_MENU_MAX)
 
-# 保存資料
-def save_prizes():
-    global prizes_data
-    try:
-        with open('prizes_data.json', 'w', encoding='utf-8') as f:
-            json.dump(prizes_data, f, ensure_ascii=False, indent=2)
-        print(f"💾 已保存 {len(prizes_data)} 個獎品資料")
-        # Send backup to user asynchronously
-        bot.loop.create_task(send_backup_to_user())
-    except Exception as e:
-        print(f"❌ 保存資料失敗: {e}")
+# 每個伺服器（與活動）各自的獎品狀態、儲存檔與鎖
+partitions = PartitionManager(
+    STORAGE_MODE, send_backup_to_user,
+    {
+        "save_max_delay": SAVE_MAX_DELAY,
+        "save_max_batch": SAVE_MAX_BATCH,
+        "backup_cooldown": BACKUP_COOLDOWN,
+        "backup_full_every": BACKUP_FULL_EVERY,
+        "journal_compact_interval": JOURNAL_COMPACT_INTERVAL,
+    },
+    legacy_guild_id=LEGACY_GUILD_ID,
+    scheduler=prize_scheduler,
+    menus=live_menus
+)
+# 頻道 -> 目前使用的活動 ID（!event 設定，未設定時使用伺服器的預設分區）
+active_events = {}
 
-# 載入資料
-load_prizes()
+async def partition_for(source):
+    # source 可以是 Context 或 Interaction
+    return await partitions.get(source.guild.id, active_events.get(source.channel.id))
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True  # 需要成員意圖
 
 bot = commands.Bot(command_prefix='!', intents=intents)
+outbound = OutboundScheduler()
+member_cache = MemberCache(max_size=MEMBER_CACHE_SIZE, ttl=MEMBER_CACHE_TTL, scheduler=outbound)
+action_limiter = SlidingWindowLimiter(limit=ACTION_LIMIT, window=ACTION_WINDOW)
+
+def health_status():
+    # 由 gateway 實際狀態判斷健康：已就緒、連線未關閉、心跳延遲有效且最近有收到 ACK
+    latency = bot.latency
+    keep_alive_handler = getattr(bot.ws, '_keep_alive', None) if bot.ws else None
+    last_ack = getattr(keep_alive_handler, '_last_ack', None)
+    ack_age = time.perf_counter() - last_ack if last_ack else None
+    body = {
+        "ready": bot.is_ready(),
+        "closed": bot.is_closed(),
+        "latency": latency if math.isfinite(latency) else None,
+        "last_heartbeat_ack_age": ack_age,
+        "guilds": len(bot.guilds),
+    }
+    ok = body["ready"] and not body["closed"] and body["latency"] is not None and (ack_age is None or ack_age < 60)
+    return ok, body
+
+def metrics_text():
+    cache_stats = member_cache.stats()
+    outbound_stats = outbound.stats()
+    gauges = {
+        "persistence_queue_depth": sum(p.persistence.queue_depth for p in partitions.values()),
+        "partitions": len(partitions.values()),
+        "member_cache_hit_ratio": round(cache_stats["hit_rate"], 4),
+        "member_cache_entries": cache_stats["entries"],
+        "outbound_queued": outbound_stats["queued"],
+        "outbound_rate_limited": outbound_stats["rate_limited"],
+        "live_menus": len(live_menus),
+        "throttle_users": len(action_limiter),
+        "gateway_latency_seconds": bot.latency if math.isfinite(bot.latency) else -1,
+        "ready": int(bot.is_ready()),
+    }
+    return metrics.prometheus(gauges)
+
+async def setup_hook():
+    # 健康檢查與指標伺服器跑在 bot 自己的事件迴圈中
+    await keep_alive.start(health_status, metrics_text)
+    # 獎品清單的元件以 custom_id 中的獎品 ID 路由，重新啟動後舊訊息仍可使用
+    bot.add_dynamic_items(PrizeJoinButton, LeavePrizeButton, PrizeSelect, PageBulkButton, AllParticipantsButton)
+
+bot.setup_hook = setup_hook
+
+# 所有輸出都經過 outbound 排程器限流；互動回應走最高優先權
+async def send(target, *args, lane=LANE_NORMAL, **kwargs):
+    # target 可以是 Context 或頻道
+    channel = getattr(target, 'channel', target)
+    return await outbound.run(("channel", channel.id), lambda: target.send(*args, **kwargs), lane)
+
+async def send_file(target, content, make_file, lane=LANE_NORMAL):
+    # discord.File 送出後即關閉，遇到 429 重送時需要新的物件，所以在 lambda 內由 make_file() 建立
+    channel = getattr(target, 'channel', target)
+    return await outbound.run(("channel", channel.id), lambda: target.send(content, file=make_file()), lane)
 
-class LeavePrizeButton(Button):
-    def __init__(self, prize_name):
-        super().__init__(label=f"退出「{prize_name}」抽獎", style=discord.ButtonStyle.danger, custom_id=f"leave_{prize_name}")
-        self.prize_name = prize_name
+async def interact(interaction, method, *args, **kwargs):
+    # method 為 interaction.response 的方法名稱（send_message、defer、edit_message、send_modal）
+    return await outbound.run(
+        ("interaction", interaction.id),
+        lambda: getattr(interaction.response, method)(*args, **kwargs),
+        LANE_INTERACTIVE
+    )
+
+async def followup(interaction, *args, lane=LANE_NORMAL, **kwargs):
+    return await outbound.run(("followup", interaction.token), lambda: interaction.followup.send(*args, **kwargs), lane)
+
+# 所有獎品清單的元件都是 DynamicItem：custom_id 只含短整數獎品 ID（與活動 ID），
+# 啟動時以 bot.add_dynamic_items 註冊一次，重新啟動後舊訊息上的按鈕不需重新發送也能使用
+EVENT_SUFFIX = r'(?::(?P<event>[^:]+))?'
+
+def component_id(partition, *parts):
+    # custom_id 附上活動 ID，頻道之後切換活動時舊訊息仍指向原本的分區
+    if partition.event:
+        parts += (partition.event,)
+    return ":".join(str(p) for p in parts)
+
+async def partition_from_match(interaction, match):
+    return await partitions.get(interaction.guild.id, match["event"])
+
+async def throttled(interaction):
+    # 所有會變更名單的元件都先經過這裡；被限制時只回一則短訊息，不碰資料也不觸發保存與備份
+    retry_after = action_limiter.hit(interaction.user.id)
+    if not retry_after:
+        return False
+    metrics.incr("throttled")
+    await interact(interaction, "send_message", f"⏳ 操作太頻繁，請 {math.ceil(retry_after)} 秒後再試。", ephemeral=True)
+    return True
+
+def button_label(template, name):
+    # 按鈕標籤最多 80 字元
+    room = 80 - len(template.format(""))
+    return template.format(name if len(name) <= room else name[:room - 1] + "…")
+
+class LeavePrizeButton(DynamicItem[Button], template=r'prize:leave:(?P<id>[0-9]+)' + EVENT_SUFFIX):
+    def __init__(self, partition, prize_id, prize_name=None):
+        super().__init__(Button(
+            label=button_label("退出「{}」抽獎", prize_name) if prize_name else None,
+            style=discord.ButtonStyle.danger,
+            custom_id=component_id(partition, "prize", "leave", prize_id)
+        ))
+        self.partition = partition
+        self.prize_id = prize_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(await partition_from_match(interaction, match), int(match["id"]))
 
     async def callback(self, interaction: discord.Interaction):
-        user_id = str(interaction.user.id)
+        if await throttled(interaction):
+            return
+        with metrics.timer("button.leave"):
+            await self._leave(interaction)
 
-        if self.prize_name in prizes_data and user_id in prizes_data[self.prize_name]["participants"]:
-            prizes_data[self.prize_name]["participants"].remove(user_id)
-            save_prizes()
-            await interaction.response.send_message(f"✅ 你已退出「{self.prize_name}」抽獎。", ephemeral=True)
+    async def _leave(self, interaction):
+        user_id = interaction.user.id
+        prize = self.partition.store.by_id(self.prize_id)
+
+        if prize is None:
+            await interact(interaction, "send_message", "❌ 這個獎品已不存在。", ephemeral=True)
+        elif self.partition.store.is_closed(prize.name):
+            await interact(interaction, "send_message", f"🔒 「{prize.name}」名單已截止。", ephemeral=True)
+        elif self.partition.store.leave(prize.name, user_id):
+            # 先標記保存（O(1)，不阻塞），回應失敗時變更也不會遺失
+            self.partition.save({"op": "leave", "prize": prize.name, "user": user_id})
+            metrics.incr("leave")
+            await interact(interaction, "send_message", f"✅ 你已退出「{prize.name}」抽獎。", ephemeral=True)
         else:
-            await interaction.response.send_message(f"⚠️ 你尚未參加「{self.prize_name}」，無法退出。", ephemeral=True)
+            await interact(interaction, "send_message", f"⚠️ 你尚未參加「{prize.name}」，無法退出。", ephemeral=True)
+
+class PrizeJoinButton(DynamicItem[Button], template=r'prize:join:(?P<id>[0-9]+)' + EVENT_SUFFIX):
+    def __init__(self, partition, prize_id, prize_name=None):
+        super().__init__(Button(
+            label=button_label("參加「{}」", prize_name) if prize_name else None,
+            style=discord.ButtonStyle.primary,
+            custom_id=component_id(partition, "prize", "join", prize_id)
+        ))
+        self.partition = partition
+        self.prize_id = prize_id
 
-class PrizeJoinButton(Button):
-    def __init__(self, prize_name):
-        super().__init__(label=f"參加「{prize_name}」", style=discord.ButtonStyle.primary, custom_id=f"join_{prize_name}")
-        self.prize_name = prize_name
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(await partition_from_match(interaction, match), int(match["id"]))
 
     async def callback(self, interaction: discord.Interaction):
-        user_id = str(interaction.user.id)
+        if await throttled(interaction):
+            return
+        with metrics.timer("button.join"):
+            await self._join(interaction)
+
+    async def _join(self, interaction):
+        user_id = interaction.user.id
+        prizes_data = self.partition.store
+        # 以整數 ID 查表，不需要比對獎品名稱
+        prize = prizes_data.by_id(self.prize_id)
+        
+        if prize is None:
+            await interact(interaction, "send_message", "❌ 這個獎品已不存在。", ephemeral=True)
+            return
         
-        if self.prize_name not in prizes_data:
-            await interaction.response.send_message(f"❌ 「{self.prize_name}」已不存在。", ephemeral=True)
+        # 正在抽獎的獎品立即回覆截止，不等待抽獎完成；其他獎品照常加入
+        if prizes_data.is_closed(prize.name):
+            await interact(interaction, "send_message", f"🔒 「{prize.name}」名單已截止。", ephemeral=True)
             return
         
-        if user_id in prizes_data[self.prize_name]["participants"]:
+        if not prizes_data.join(prize.name, user_id):
             view = View()
-            view.add_item(LeavePrizeButton(self.prize_name))
-            await interaction.response.send_message(f"⚠️ 你已參加過「{self.prize_name}」的抽獎。", ephemeral=True, view=view)
+            view.add_item(LeavePrizeButton(self.partition, prize.id, prize.name))
+            await interact(interaction, "send_message", f"⚠️ 你已參加過「{prize.name}」的抽獎。", ephemeral=True, view=view)
             return
         
-        prizes_data[self.prize_name]["participants"].append(user_id)
-        save_prizes()
-        await interaction.response.send_message(f"✅ 你已成功參加「{self.prize_name}」的抽獎！", ephemeral=True)
+        # 先標記保存（O(1)，實際寫入交給背景 worker）再回應；回應失敗時變更也不會遺失
+        self.partition.save({"op": "join", "prize": prize.name, "user": user_id})
+        metrics.incr("join")
+        await interact(interaction, "send_message", f"✅ 你已成功參加「{prize.name}」的抽獎！", ephemeral=True)
+
+def bulk_update(partition, op, targets, user_id):
+    """一次套用多個獎品的加入（op="join"）或退出（op="leave"），所有變更以單一批次保存。
+
+    targets 為 [(獎品 ID, 顯示名稱)]；回傳 (已變更, 未變更, 已截止, 已不存在) 四個名稱清單。
+    """
+    store = partition.store
+    apply = store.join if op == "join" else store.leave
+    now = time.time()
+    changed, unchanged, closed, missing = [], [], [], []
+    for prize_id, label in targets:
+        prize = store.by_id(prize_id)
+        if prize is None:
+            missing.append(label)
+        elif store.is_closed(prize.name, now):
+            closed.append(prize.name)
+        elif apply(prize.name, user_id):
+            changed.append(prize.name)
+        else:
+            unchanged.append(prize.name)
+    if changed:
+        partition.save(*({"op": op, "prize": name, "user": user_id} for name in changed))
+        metrics.incr(op, len(changed))
+    return changed, unchanged, closed, missing
 
-class AllParticipantsButton(Button):
-    def __init__(self):
-        super().__init__(label="查看所有參加者清單", style=discord.ButtonStyle.secondary, custom_id="list_all")
+def bulk_summary(op, changed, unchanged, closed, missing):
+    lines = []
+    if changed:
+        lines.append(("✅ 已參加：" if op == "join" else "✅ 已退出：") + "、".join(changed))
+    if unchanged:
+        lines.append(("⚠️ 先前已參加：" if op == "join" else "⚠️ 原本就未參加：") + "、".join(unchanged))
+    if closed:
+        lines.append("🔒 名單已截止：" + "、".join(closed))
+    if missing:
+        lines.append("❌ 已不存在：" + "、".join(missing))
+    return "\n".join(lines) or "ℹ️ 沒有任何變更。"
+
+async def apply_bulk(interaction, partition, op, targets):
+    result = bulk_update(partition, op, targets, interaction.user.id)
+    await interact(interaction, "send_message", bulk_summary(op, *result), ephemeral=True)
+
+def select_options(partition, prize_ids, names):
+    prizes_data = partition.store
+    options = []
+    for prize_id, name in zip(prize_ids, names):
+        prize = prizes_data.by_id(prize_id)
+        description = f"{prize.winners} 人得獎 · {len(prize.participants)} 人參加" if prize else "已抽獎或已移除"
+        # 選項值為獎品 ID，獎品名稱可能超過 100 字元的上限
+        options.append(discord.SelectOption(label=name[:100], value=str(prize_id), description=description))
+    return options
+
+class PrizeSelect(DynamicItem[Select], template=r'page:select' + EVENT_SUFFIX):
+    def __init__(self, partition, options=None):
+        super().__init__(Select(
+            placeholder="選擇要參加的獎品（可多選）",
+            min_values=1, max_values=len(options) if options else 1, options=options or [],
+            custom_id=component_id(partition, "page", "select")
+        ))
+        self.partition = partition
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        # 沿用訊息上的選項，已不存在的獎品以選項標籤回報
+        return cls(await partition_from_match(interaction, match), item.options)
 
     async def callback(self, interaction: discord.Interaction):
-        if not prizes_data:
-            await interaction.response.send_message("📭 目前沒有獎品。", ephemeral=True)
+        if await throttled(interaction):
+            return
+        with metrics.timer("select.join"):
+            labels = {option.value: option.label for option in self.item.options}
+            targets = [(int(value), labels.get(value, value)) for value in self.item.values]
+            await apply_bulk(interaction, self.partition, "join", targets)
+
+class PageBulkButton(DynamicItem[Button], template=r'page:(?P<op>join|leave)' + EVENT_SUFFIX):
+    def __init__(self, partition, op, targets=()):
+        super().__init__(Button(
+            label="全部參加" if op == "join" else "全部退出",
+            style=discord.ButtonStyle.success if op == "join" else discord.ButtonStyle.danger,
+            custom_id=component_id(partition, "page", op)
+        ))
+        self.partition = partition
+        self.op = op
+        self.targets = list(targets)
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        # 本頁的獎品 ID 取自同一則訊息上多選選單的選項，custom_id 不需要記錄整頁的 ID
+        targets = []
+        for component in item.view.children:
+            if isinstance(component, Select):
+                targets = [(int(option.value), option.label) for option in component.options]
+                break
+        return cls(await partition_from_match(interaction, match), match["op"], targets)
+
+    async def callback(self, interaction: discord.Interaction):
+        if await throttled(interaction):
+            return
+        with metrics.timer(f"button.bulk_{self.op}"):
+            await apply_bulk(interaction, self.partition, self.op, self.targets)
+
+class PrizePageView(View):
+    """!show_prizes 的單頁：多選選單、全部參加 / 全部退出，以及每個獎品的參加按鈕。
+
+    多選與全部參加 / 退出只產生一次互動回應與一次保存，開放報名時的互動與寫入量大幅減少。
+    所有元件都是 DynamicItem，這個 View 只用於發送與就地更新參加人數，不必常駐在記憶體中處理點擊。
+    """
+
+    def __init__(self, partition, prize_names, last_page=False):
+        super().__init__(timeout=None)
+        self.partition = partition
+        self.prize_names = prize_names
+        self.prize_ids = [partition.store[name].id for name in prize_names]
+        self.message = None
+        self.embed = None
+        self.select = PrizeSelect(partition, select_options(partition, self.prize_ids, prize_names))
+        self.add_item(self.select)
+        self.add_item(PageBulkButton(partition, "join"))
+        self.add_item(PageBulkButton(partition, "leave"))
+        for prize_id, name in zip(self.prize_ids, prize_names):
+            self.add_item(PrizeJoinButton(partition, prize_id, name))
+        if last_page:
+            self.add_item(AllParticipantsButton(partition))
+
+    async def post(self, ctx, embed):
+        # 發出後由 live_menus 追蹤，參加人數變更時以 refresh() 編輯同一則訊息
+        self.embed = embed
+        self.message = await send(ctx, embed=embed, view=self)
+        live_menus.track(self.partition, self.message.id, self.prize_names, self.refresh)
+
+    async def refresh(self):
+        # 欄位與 prize_ids 一一對應；只有內容真的變了才編輯
+        store = self.partition.store
+        changed = False
+        for i, prize_id in enumerate(self.prize_ids):
+            value = prize_field_value(store.by_id(prize_id))
+            field = self.embed.fields[i]
+            if field.value != value:
+                self.embed.set_field_at(i, name=field.name, value=value, inline=field.inline)
+                changed = True
+        if not changed:
+            return True
+        self.select.item.options = select_options(self.partition, self.prize_ids, self.prize_names)
+        try:
+            await outbound.run(
+                ("channel", self.message.channel.id),
+                lambda: self.message.edit(embed=self.embed, view=self),
+                LANE_BULK
+            )
+        except discord.NotFound:
+            return False
+        return True
+
+class PageJumpModal(discord.ui.Modal, title="跳至頁碼"):
+    page = discord.ui.TextInput(label="頁碼", max_length=6)
+
+    def __init__(self, browser):
+        super().__init__()
+        self.browser = browser
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            self.browser.page = int(self.page.value) - 1
+        except ValueError:
+            await interact(interaction, "send_message", "⚠️ 請輸入數字頁碼。", ephemeral=True)
+            return
+        await self.browser.refresh(interaction)
+
+class PrizeFilterModal(discord.ui.Modal, title="篩選獎品"):
+    keyword = discord.ui.TextInput(label="獎品名稱包含（留空顯示全部）", required=False, max_length=100)
+
+    def __init__(self, browser):
+        super().__init__()
+        self.browser = browser
+        self.keyword.default = browser.prize_filter
+
+    async def on_submit(self, interaction: discord.Interaction):
+        self.browser.prize_filter = self.keyword.value.strip()
+        self.browser.page = 0
+        await self.browser.refresh(interaction)
+
+class ParticipantBrowser(View):
+    """單一訊息的參加者瀏覽器：按需渲染目前頁面，只解析該頁顯示的參加者名稱。"""
+
+    # (分區, user_id, 篩選, 頁碼, 總頁數) -> (到期時間, [embed])
+    _rendered = {}
+
+    def __init__(self, partition, user_id, prize_filter=""):
+        super().__init__(timeout=300)
+        self.partition = partition
+        self.user_id = user_id
+        self.prize_filter = prize_filter
+        self.page = 0
+        self.total_pages = 1
+
+    def _layout(self):
+        # 只依參加人數切頁，不讀取名稱；大型獎品會跨頁延續
+        pages = []
+        current = []
+        used = 0
+        for name, prize in self.partition.store.items():
+            if self.prize_filter and self.prize_filter not in name:
+                continue
+            total = len(prize.participants)
+            start = 0
+            while True:
+                if used >= PARTICIPANT_PAGE_ENTRIES or len(current) >= PARTICIPANT_PAGE_PRIZES:
+                    pages.append(current)
+                    current = []
+                    used = 0
+                end = min(total, start + PARTICIPANT_PAGE_ENTRIES - used)
+                current.append((name, prize, start, end))
+                used += max(end - start, 1)
+                start = end
+                if start >= total:
+                    break
+        if current:
+            pages.append(current)
+        return pages
+
+    async def render(self, guild):
+        pages = self._layout()
+        self.total_pages = max(len(pages), 1)
+        self.page = min(max(self.page, 0), self.total_pages - 1)
+        key = (self.partition.label, self.user_id, self.prize_filter, self.page, self.total_pages)
+        now = time.monotonic()
+        cached = self._rendered.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        # 與 !show_prizes 相同經過 EmbedPager，欄位名稱、內容與 6000 字元總長都套用 Discord 的限制
+        pager = EmbedPager(
+            f"🎁 所有獎品參加者清單 (頁 {self.page + 1}/{self.total_pages})",
+            description=f"篩選：「{self.prize_filter}」" if self.prize_filter else "以下是各獎品的參加者名單：",
+            footer="請遵守抽獎規則！"
+        )
+        if not pages:
+            pager.add_field("📭 無結果", "沒有符合的獎品。")
+        else:
+            slices = [(name, prize, [prize.participants[i] for i in range(start, end)], start)
+                      for name, prize, start, end in pages[self.page]]
+            members = await member_cache.resolve(guild, [p for _, _, shown, _ in slices for p in shown])
+            for name, prize, shown, start in slices:
+                field_name = f"📦 {name}（{prize.winners}人）" + ("（續）" if start else "")
+                if shown:
+                    pager.add_items(field_name, [display_name(p, members) for p in shown], template="👥 參加者：{}",
+                                    continued="" if start else "（續）")
+                else:
+                    pager.add_field(field_name, "📭 尚無參加者")
+        # 換頁是編輯同一則訊息，只能放一則訊息的嵌入；名稱極長時其餘內容不顯示並註明
+        messages = pager.messages()
+        if len(messages) > 1:
+            # 註明改放在頁尾並重新分頁，讓它也計入長度限制
+            pager.footer = "⚠️ 本頁內容超過 Discord 的長度限制，部分參加者未顯示"
+            messages = pager.messages()
+        embeds = messages[0]
+
+        # 順便清掉過期的頁面
+        for stale in [k for k, (expires, _) in self._rendered.items() if expires <= now]:
+            del self._rendered[stale]
+        self._rendered[key] = (now + PARTICIPANT_PAGE_CACHE_TTL, embeds)
+        return embeds
+
+    def _sync_buttons(self):
+        self.prev_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.total_pages - 1
+
+    async def refresh(self, interaction):
+        with metrics.timer("button.list_page"):
+            embeds = await self.render(interaction.guild)
+        self._sync_buttons()
+        await interact(interaction, "edit_message", embeds=embeds, view=self)
+
+    @discord.ui.button(label="◀ 上一頁", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: Button):
+        self.page -= 1
+        await self.refresh(interaction)
+
+    @discord.ui.button(label="下一頁 ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: Button):
+        self.page += 1
+        await self.refresh(interaction)
+
+    @discord.ui.button(label="跳至頁碼", style=discord.ButtonStyle.secondary)
+    async def jump_page(self, interaction: discord.Interaction, button: Button):
+        await interact(interaction, "send_modal", PageJumpModal(self))
+
+    @discord.ui.button(label="🔍 篩選獎品", style=discord.ButtonStyle.primary)
+    async def filter_prizes(self, interaction: discord.Interaction, button: Button):
+        await interact(interaction, "send_modal", PrizeFilterModal(self))
+
+class AllParticipantsButton(DynamicItem[Button], template=r'page:list_all' + EVENT_SUFFIX):
+    def __init__(self, partition):
+        super().__init__(Button(
+            label="查看所有參加者清單", style=discord.ButtonStyle.secondary,
+            custom_id=component_id(partition, "page", "list_all")
+        ))
+        self.partition = partition
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(await partition_from_match(interaction, match))
+
+    async def callback(self, interaction: discord.Interaction):
+        with metrics.timer("button.list_all"):
+            await self._list_all(interaction)
+
+    async def _list_all(self, interaction):
+        if not self.partition.store:
+            await interact(interaction, "send_message", "📭 目前沒有獎品。", ephemeral=True)
             return
         
         try:
             # 立即延遲回應，避免交互超時
-            await interaction.response.defer(ephemeral=True)
-
-            # 緩存當前伺服器成員
-            guild = interaction.guild
-            member_cache = {member.id: member for member in guild.members}
-            logging.debug(f"已緩存 {len(member_cache)} 個成員")
-
-            prize_items = list(prizes_data.items())
-            page_size = 5  # 每頁最多 5 項獎品，減少第一頁處理時間
-            total_pages = math.ceil(len(prize_items) / page_size)
-
-            for page in range(total_pages):
-                embed = discord.Embed(
-                    title=f"🎁 所有獎品參加者清單 (頁 {page + 1}/{total_pages})",
-                    description="以下是各獎品的參加者名單：",
-                    color=discord.Color.red()
-                )
-                start_idx = page * page_size
-                end_idx = min(start_idx + page_size, len(prize_items))
-                
-                for prize, info in prize_items[start_idx:end_idx]:
-                    participant_names = []
-                    for participant_id in info["participants"]:
-                        try:
-                            user_id = int(participant_id)
-                            # 優先使用緩存
-                            user = member_cache.get(user_id)
-                            if not user:
-                                try:
-                                    user = await guild.fetch_member(user_id)
-                                    member_cache[user_id] = user
-                                    logging.debug(f"fetch_member 成功: {user_id}")
-                                except discord.NotFound:
-                                    user = None
-                                except Exception as e:
-                                    logging.error(f"fetch_member 失敗: {e}")
-                            if user:
-                                participant_names.append(user.display_name)
-                            else:
-                                participant_names.append(f"ID:{participant_id}")
-                        except ValueError:
-                            participant_names.append(participant_id)
-                    
-                    participants_str = ", ".join(participant_names) if participant_names else "📭 尚無參加者"
-                    embed.add_field(
-                        name=f"📦 {prize}（{info['winners']}人）",
-                        value=f"👥 參加者：{participants_str}",
-                        inline=False
-                    )
-                
-                embed.set_footer(text="請遵守抽獎規則！")
-                # 第一頁使用 followup（因已 defer），後續頁繼續使用 followup
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                # 添加延遲，避免 API 限制
-                await asyncio.sleep(0.5)
+            await interact(interaction, "defer", ephemeral=True)
+
+            # 只渲染第一頁，其餘頁面由按鈕按需渲染並編輯同一則訊息
+            browser = ParticipantBrowser(self.partition, interaction.user.id)
+            embeds = await browser.render(interaction.guild)
+            browser._sync_buttons()
+            await followup(interaction, embeds=embeds, view=browser, ephemeral=True)
 
         except Exception as e:
-            logging.error(f"AllParticipantsButton 錯誤: {e}")
-            await interaction.followup.send(f"❌ 顯示參加者清單失敗：{e}", ephemeral=True)
+            logging.error("AllParticipantsButton 錯誤: %s", e)
+            await followup(interaction, f"❌ 顯示參加者清單失敗：{e}", ephemeral=True)
 
-# 設置日誌
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+def prize_field_value(prize):
+    if prize is None:
+        return "🎉 已抽獎或已移除"
+    return f"**得獎人數**：{prize.winners}\n**參加者**：{len(prize.participants)} 人{schedule_text(prize)}"
 
-# 定義內建類型（避免被覆蓋的 list 影響）
-_builtin_list = list
-_builtin_dict = dict
-_builtin_str = str
-_builtin_int = int
+def schedule_text(prize):
+    # Discord 時間戳記會依使用者的時區顯示
+    lines = []
+    if prize.close_at is not None:
+        lines.append(f"\n**截止**：<t:{int(prize.close_at)}:R>")
+    if prize.draw_at is not None:
+        lines.append(f"\n**抽獎**：<t:{int(prize.draw_at)}:R>")
+    return "".join(lines)
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def show_prizes(ctx):
-    global prizes_data
-    try:
-        content = _builtin_list(prizes_data.keys())[:5] if isinstance(prizes_data, _builtin_dict) else prizes_data
-        logging.debug(f"執行 !show_prizes, prizes_data 類型: {type(prizes_data)}, 內容: {content}")
-    except Exception as e:
-        logging.error(f"記錄 prizes_data 失敗: {e}")
-    if not isinstance(prizes_data, _builtin_dict):
-        logging.error(f"prizes_data 類型錯誤: {type(prizes_data)}, 內容: {prizes_data}")
+    partition = await partition_for(ctx)
+    prizes_data = partition.store
+    logging.debug("執行 !show_prizes [%s]：%s 項獎品", partition.label, len(prizes_data))
+    if not isinstance(prizes_data, PrizeStore):
+        logging.error("prizes_data 類型錯誤: %s, 內容: %s", type(prizes_data), prizes_data)
         embed = discord.Embed(
             title="❌ 錯誤",
             description="獎品資料異常，請聯繫管理員檢查 prizes_data.json。",
             color=discord.Color.red()
         )
-        await ctx.send(embed=embed)
+        await send(ctx, embed=embed)
         return
     if not prizes_data:
         embed = discord.Embed(
@@ -283,59 +699,81 @@ async def show_prizes(ctx):
             description="目前沒有獎品。請先用 !add_prize 新增。",
             color=discord.Color.red()
         )
-        await ctx.send(embed=embed)
+        await send(ctx, embed=embed)
         return
 
-    # 分頁設定：每頁 12 項
-    page_size = 12
-    prize_items = _builtin_list(prizes_data.items())
-    total_pages = math.ceil(len(prize_items) / page_size)  # 33 項分 3 頁（12、12、9）
-
-    # 發送每頁的嵌入訊息
-    for page in range(total_pages):
-        view = View(timeout=None)  # 每頁獨立的 View
-        start_idx = page * page_size
-        end_idx = min(start_idx + page_size, len(prize_items))
-        embed = discord.Embed(
-            title=f"🎁 焰獄拍賣會獎品清單 (頁 {page + 1}/{total_pages})",
-            description="請點擊下方按鈕參加你想要的獎品抽獎：",
-            color=discord.Color.red()
+    # 依嵌入實際大小分頁；每頁的欄位與參加按鈕一一對應。View 最多 5 列、每列 5 個按鈕，
+    # 多選選單獨佔一列，其餘 4 列放全部參加 / 全部退出、「查看所有參加者」與最多 PRIZES_PER_PAGE 個參加按鈕
+    pager = EmbedPager(
+        "🎁 焰獄拍賣會獎品清單",
+        description="請使用下方選單一次參加多個獎品，或點擊按鈕參加你想要的獎品抽獎：",
+        footer="請遵守抽獎規則！",
+        max_fields=PRIZES_PER_PAGE
+    )
+    for prize, info in prizes_data.items():
+        pager.add_field(
+            f"📦 {prize}",
+            prize_field_value(info),
+            inline=True,
+            key=prize
         )
-        try:
-            logging.debug(f"生成頁 {page + 1}: 顯示獎品索引 {start_idx} 到 {end_idx}, 項目: {[name for name, _ in prize_items[start_idx:end_idx]]}")
-            for prize, info in prize_items[start_idx:end_idx]:
-                embed.add_field(
-                    name=f"📦 {prize}",
-                    value=f"**得獎人數**：{info['winners']}\n**參加者**：{len(info['participants'])} 人",
-                    inline=True
-                )
-                view.add_item(PrizeJoinButton(prize))
-        except Exception as e:
-            logging.error(f"生成嵌入欄位失敗 (頁 {page + 1}): {e}")
-            embed.add_field(
-                name="❌ 錯誤",
-                value="無法顯示獎品清單，請聯繫管理員。",
-                inline=False
-            )
-        
-        # 最後一頁添加「查看所有參加者」按鈕
-        if page == total_pages - 1:
-            view.add_item(AllParticipantsButton())
-        
-        embed.set_footer(text="請遵守抽獎規則！")
-        await ctx.send(embed=embed, view=view)
+    pages = pager.embeds()
+    logging.debug("!show_prizes：%s 項獎品分為 %s 頁", len(prizes_data), len(pages))
+
+    # 發送每頁的嵌入訊息；最後一頁添加「查看所有參加者」按鈕。參加人數之後會就地更新，不需要重新執行
+    for page, (embed, prize_names) in enumerate(pages):
+        view = PrizePageView(partition, prize_names, last_page=page == len(pages) - 1)
+        await view.post(ctx, embed)
 
 @bot.event
 async def on_ready():
+    global STARTUP_BEGAN
     print(f'✅ Bot 已登入：{bot.user}')
-    print(f"DEBUG: Bot 在 {len(bot.guilds)} 個伺服器中")
-    save_prizes()
+    logging.info("Bot 在 %s 個伺服器中", len(bot.guilds))
+    # 在執行緒中載入所有伺服器的分區；資料沒有變更時不重寫快照、也不送備份（重新連線也會觸發 on_ready）
+    with metrics.timer("startup.load"):
+        await partitions.load_all(guild.id for guild in bot.guilds)
+    partitions.start()
+    prize_scheduler.start()
+    if STARTUP_BEGAN is not None:
+        loaded = partitions.values()
+        logging.info(
+            "🚀 啟動完成，耗時 %.2f 秒（%s 個分區、%s 個獎品）",
+            time.monotonic() - STARTUP_BEGAN, len(loaded), sum(len(p.store) for p in loaded)
+        )
+        STARTUP_BEGAN = None
+    # 以 guild chunking 預熱成員快取，之後由成員事件保持最新
+    for guild in bot.guilds:
+        try:
+            await member_cache.prime(guild)
+        except Exception as e:
+            logging.error("預熱成員快取失敗 (%s): %s", guild.id, e)
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def add_prize(ctx, *, prize_input):
-    global prizes_data
+    # !add_prize 獎品A:2, 獎品B [close=時間] [draw=時間]：時間可為 30m、2h、HH:MM 或 YYYY-MM-DD HH:MM
+    partition = await partition_for(ctx)
+    prizes_data = partition.store
+    times = {}
+    try:
+        for key, value in SCHEDULE_OPTION.findall(prize_input):
+            times[key] = parse_when(value, get_timezone())
+    except ValueError as e:
+        await send(ctx, f"❌ {e}")
+        return
+    prize_input = SCHEDULE_OPTION.sub("", prize_input)
+    close_at, draw_at = times.get("close"), times.get("draw")
+    if any(t <= time.time() for t in times.values()):
+        await send(ctx, "❌ 截止與抽獎時間必須在未來。")
+        return
+    if close_at is not None and draw_at is not None and close_at > draw_at:
+        await send(ctx, "❌ 截止時間不能晚於抽獎時間。")
+        return
+    schedule = (close_at, draw_at, ctx.channel.id) if times else None
+
     added = []
+    records = []
     existed = []
     for item in [i.strip() for i in prize_input.split(',') if i.strip()]:
         if ':' in item:
@@ -349,213 +787,252 @@ async def add_prize(ctx, *, prize_input):
             name = item
             count = 1
 
-        if name in prizes_data:
+        prize = prizes_data.add(name, count, schedule)
+        if prize is None:
             existed.append(name)
         else:
-            prizes_data[name] = {"participants": [], "winners": count}
             added.append(f"{name}（{count}人）")
+            record = {"op": "add", "prize": name, "winners": count, "id": prize.id}
+            if schedule:
+                record.update(close_at=close_at, draw_at=draw_at, channel=ctx.channel.id)
+                prize_scheduler.schedule(partition, prize)
+            records.append(record)
 
     msg = []
     if added:
         msg.append("🎁 已新增獎品：" + ", ".join(added))
+        if close_at is not None:
+            msg.append(f"🔒 報名截止：<t:{int(close_at)}:f>（<t:{int(close_at)}:R>）")
+        if draw_at is not None:
+            msg.append(f"🎲 自動抽獎：<t:{int(draw_at)}:f>（<t:{int(draw_at)}:R>），結果會發在此頻道")
     if existed:
         msg.append("⚠️ 已存在：" + ", ".join(existed))
-    await ctx.send("\n".join(msg) if msg else "請輸入要新增的獎品名稱。")
-    
-    if added:
-        save_prizes()
+    # 先保存再回覆：回覆失敗時 add 紀錄仍會寫入，之後的 join 紀錄才找得到獎品
+    if records:
+        partition.save(*records)
+    await send(ctx, "\n".join(msg) if msg else "請輸入要新增的獎品名稱。")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def prizes_list(ctx):
-    if not prizes_data:
-        await ctx.send("📭 目前沒有獎品。")
+    partition = await partition_for(ctx)
+    prize_rows = await partition.fetch_rows()
+    if not prize_rows:
+        await send(ctx, "📭 目前沒有獎品。")
     else:
-        msg = ["🎁 獎品清單："]
-        for prize, info in prizes_data.items():
-            msg.append(f"\n📦 {prize}（{info['winners']}人）")
-            if info["participants"]:
-                participant_names = []
-                for participant_id in info["participants"]:
-                    try:
-                        user_id = int(participant_id)
-                        user = ctx.guild.get_member(user_id)
-                        if user:
-                            participant_names.append(user.display_name)
-                        else:
-                            participant_names.append(f"ID:{participant_id}")
-                    except ValueError:
-                        participant_names.append(participant_id)
-                
-                msg.append(f"👥 參加者：{', '.join(participant_names)}")
+        members = await member_cache.resolve(ctx.guild, [p for _, _, participants in prize_rows for p in participants])
+        pager = EmbedPager("🎁 獎品清單")
+        for prize, winners, participants in prize_rows:
+            if participants:
+                pager.add_items(f"📦 {prize}（{winners}人）", [display_name(p, members) for p in participants],
+                                template="👥 參加者：{}")
             else:
-                msg.append("📭 尚無參加者")
-        await ctx.send("\n".join(msg))
+                pager.add_field(f"📦 {prize}（{winners}人）", "📭 尚無參加者")
+        await send_pages(ctx, pager)
 
 @bot.command(name="list")
 @commands.has_permissions(administrator=True)
 async def prize_participants(ctx, *, prize_names):
     names = [n.strip() for n in prize_names.split(',') if n.strip()]
+    partition = await partition_for(ctx)
+    found = {name: participants for name, _, participants in await partition.fetch_rows(names)} if names else {}
+    members = await member_cache.resolve(ctx.guild, [p for participants in found.values() for p in participants])
     msg = []
+    pager = EmbedPager("👥 參加者名單")
     for name in names:
-        if name not in prizes_data:
+        if name not in found:
             msg.append(f"❌ 沒有這個獎品：「{name}」")
-        elif not prizes_data[name]["participants"]:
+        elif not found[name]:
             msg.append(f"📭 「{name}」目前沒有人參加。")
         else:
-            participant_names = []
-            for participant_id in prizes_data[name]["participants"]:
-                try:
-                    user_id = int(participant_id)
-                    user = ctx.guild.get_member(user_id)
-                    if user:
-                        participant_names.append(user.display_name)
-                    else:
-                        participant_names.append(f"ID:{participant_id}")
-                except ValueError:
-                    participant_names.append(participant_id)
-            
-            participants_str = ", ".join(participant_names)
-            msg.append(f"👥 「{name}」的參加者：{participants_str}")
-    await ctx.send("\n".join(msg) if msg else "請輸入要查詢的獎品名稱。")
+            pager.add_items(f"📦 {name}", [display_name(p, members) for p in found[name]])
+    if not names:
+        await send(ctx, "請輸入要查詢的獎品名稱。")
+        return
+    if msg:
+        await send(ctx, "\n".join(msg))
+    if pager.fields:
+        await send_pages(ctx, pager)
+
+@bot.command(name="export")
+@commands.has_permissions(administrator=True)
+async def export_lists(ctx, fmt: Optional[Literal['csv', 'jsonl']] = 'csv', *, prize_names: str = None):
+    # !export [csv|jsonl] [獎品A, 獎品B]：以檔案匯出獎品、參加者與最近的得獎名單，適合大型名單
+    partition = await partition_for(ctx)
+    names = [n.strip() for n in prize_names.split(',') if n.strip()] if prize_names else None
+    prize_rows = await partition.fetch_rows(names)
+    if names is not None:
+        # 已抽完的獎品不在名單中，但仍可匯出最近的得獎紀錄
+        known = {row[0] for row in prize_rows}
+        known.update(p.name for _, result in partition.draws for p in result.prizes)
+        missing = [n for n in names if n not in known]
+        if missing:
+            await send(ctx, "❌ 沒有這些獎品：" + "、".join(missing))
+            return
+    if not prize_rows and not partition.draws:
+        await send(ctx, "📭 目前沒有可匯出的資料。")
+        return
+
+    with metrics.timer("export"):
+        rows = exports.entries(exports.snapshot_rows(prize_rows), list(partition.draws), set(names) if names else None)
+        batches = exports.resolved(rows, lambda ids: member_cache.resolve(ctx.guild, ids))
+        path, count = await exports.write_file(fmt, batches)
+    try:
+        size = os.path.getsize(path)
+        if size > ctx.guild.filesize_limit:
+            await send(ctx, f"❌ 匯出檔案 {size / 1048576:.1f} MB 超過此伺服器的上傳上限，請指定獎品分批匯出。")
+            return
+        timestamp = datetime.datetime.now(get_timezone()).strftime('%Y%m%d_%H%M%S')
+        filename = f"export_{partition.label}_{timestamp}.{fmt}" + (".gz" if path.endswith(".gz") else "")
+        await send_file(ctx, f"📤 已匯出 {count} 筆資料", lambda: discord.File(path, filename=filename), lane=LANE_BULK)
+    finally:
+        os.remove(path)
+    logging.info("[%s] 已匯出 %s 筆資料（%s bytes）", partition.label, count, size)
+
+async def send_pages(ctx, pager, lane=LANE_NORMAL):
+    # 每則訊息最多 10 個嵌入、總字元不超過 6000；間隔由排程器依限流決定
+    for embeds in pager.messages():
+        await send(ctx, embeds=embeds, lane=lane)
+
+def format_winner(participant_id, members):
+    member = members.get(participant_id)
+    if member:
+        return member.mention
+    if isinstance(participant_id, str):
+        return f"**@{participant_id}**"
+    return f"**ID:{participant_id}**"
+
+async def send_draw_results(ctx, result):
+    # 抽獎已完成並保存，這裡只負責解析名稱與發送訊息
+    members = await member_cache.resolve(ctx.guild, result.winner_ids())
+    logging.debug("已解析 %s 位得主", len(members))
+
+    # 名單過長時拆成延續欄位，不會丟失任何得主
+    pager = EmbedPager(
+        "🎉 抽獎結果",
+        description="以下是本次抽獎的得獎名單（每人限得一項）：" if result.unique else "以下是本次抽獎的得獎名單：",
+        footer=f"請遵守抽獎規則！ · 種子 {result.seed}"
+    )
+    for prize in result.prizes:
+        if not prize.entrants:
+            pager.add_field(f"📦 {prize.name}（{prize.winner_count}人）", "😢 沒有人參加，無法抽獎。")
+            continue
+        pager.add_items(
+            f"📦 {prize.name}（{len(prize.winners)}人）",
+            [format_winner(w, members) for w in prize.winners],
+            template="🎉 恭喜 {} 獲得！"
+        )
+    unfilled = result.unfilled
+    if unfilled:
+        # 參加人數不足，或 unique 模式下符合資格的參加者不足以補滿所有名額
+        pager.add_items(
+            "⚠️ 未補滿的名額",
+            [f"{p.name}：{len(p.winners)}/{p.winner_count} 人" for p in unfilled]
+        )
+    await send_pages(ctx, pager, lane=LANE_BULK)
+    logging.debug("已發送抽獎結果：%s 項獎品", len(result.prizes))
+
+async def run_draw(partition, names=None, seed=None, unique=False):
+    """抽出 names（None 為全部獎品）的得主並保存，回傳 DrawResult；沒有可抽的獎品時回傳 None。"""
+    # 先凍結本次涵蓋的獎品（不複製名單），之後的加入 / 退出會立即收到截止回覆；
+    # 抽獎期間新增的獎品不受影響。抽出所有得主（記錄種子以便稽核、重現）後，
+    # 一次移除並以同一批紀錄保存，最後才做 Discord I/O
+    async with partition.lock:
+        prizes_data = partition.store
+        names = prizes_data.freeze(names)
+        if not names:
+            return None
+        try:
+            rows = await partition.fetch_rows(names)
+            select = draw_engine.draw_unique if unique else draw_engine.draw_all
+            with metrics.timer("draw.select"):
+                result = select(rows, seed)
+        except BaseException:
+            prizes_data.thaw(names)
+            raise
+        # 只移除實際抽出的獎品；儲存層沒有回傳的獎品（例如與記憶體不一致）解除凍結保留下來
+        drawn = [p.name for p in result.prizes]
+        skipped = set(names).difference(drawn)
+        if skipped:
+            prizes_data.thaw(skipped)
+            logging.warning("[%s] 儲存層沒有回傳 %s 項獎品，未抽獎：%s", partition.label, len(skipped), sorted(skipped))
+        if not drawn:
+            return None
+        prizes_data.commit_draw(drawn)
+        partition.save(*result.records())
+        partition.draws.append((time.time(), result))
+    logging.info(
+        "[%s] 抽獎完成：%s 項獎品，種子 %s%s", partition.label, len(result.prizes), result.seed,
+        "（每人限得一項）" if result.unique else ""
+    )
+    return result
 
 @bot.command()
 @commands.has_permissions(administrator=True)
-async def draw(ctx):
-    global prizes_data
+async def draw(ctx, mode: Optional[Literal['unique']] = None, seed: int = None):
+    # !draw [unique] [種子]：unique 模式下每人最多得一項獎品
+    partition = await partition_for(ctx)
+    prizes_data = partition.store
     
-    print(f"DEBUG: prizes_data 類型: {type(prizes_data)}")
-    print(f"DEBUG: prizes_data 內容: {prizes_data}")
+    logging.debug("執行 !draw [%s]：%s 項獎品", partition.label, len(prizes_data))
     
-    if not isinstance(prizes_data, dict):
-        await ctx.send("❌ 獎品資料異常，請重新啟動 Bot")
+    if not isinstance(prizes_data, PrizeStore):
+        await send(ctx, "❌ 獎品資料異常，請重新啟動 Bot")
         return
     
     if not prizes_data:
-        await ctx.send("📭 目前沒有獎品。")
+        await send(ctx, "📭 目前沒有獎品。")
         return
 
-    prize_names = list(prizes_data.keys())
-    prize_items = list(prizes_data.items())
-    page_size = 10  # 每頁最多 10 項獎品
-    total_pages = math.ceil(len(prize_items) / page_size)
-    fetch_count = 0  # 計數 fetch_member 調用次數
-    member_cache = {member.id: member for member in ctx.guild.members}
-    logging.debug(f"已緩存 {len(member_cache)} 個成員（guild.members）")
+    result = await run_draw(partition, seed=seed, unique=mode == 'unique')
+    if result is None:
+        await send(ctx, "📭 目前沒有可抽獎的獎品。")
+        return
 
-    for page in range(total_pages):
-        embed = discord.Embed(
-            title=f"🎉 抽獎結果 (頁 {page + 1}/{total_pages})",
-            description="以下是本次抽獎的得獎名單：",
-            color=discord.Color.red()
-        )
-        start_idx = page * page_size
-        end_idx = min(start_idx + page_size, len(prize_items))
-        
-        for name, info in prize_items[start_idx:end_idx]:
-            participants = info.get("participants", [])
-            winner_count = info.get("winners", 1)
-            print(f"DEBUG: 處理獎品: {name}, 參加者: {len(participants)}, 得主數: {winner_count}")
-            
-            if not participants:
-                embed.add_field(
-                    name=f"📦 {name}（{winner_count}人）",
-                    value="😢 沒有人參加，無法抽獎。",
-                    inline=False
-                )
-            else:
-                actual_winners = min(winner_count, len(participants))
-                try:
-                    winners = random.sample(participants, actual_winners)
-                    print(f"DEBUG: 抽中: {winners}")
-                    
-                    mention_list = []
-                    for participant_id in winners:
-                        print(f"DEBUG: 處理參加者: {participant_id} (類型: {type(participant_id)})")
-                        user = None
-                        try:
-                            user_id = int(participant_id)
-                            print(f"DEBUG: 解析為 ID: {user_id}")
-                            user = member_cache.get(user_id)
-                            if not user:
-                                if fetch_count < 50:  # 限制最大 fetch_member 調用次數
-                                    try:
-                                        user = await ctx.guild.fetch_member(user_id)
-                                        member_cache[user_id] = user
-                                        print(f"DEBUG: fetch_member 成功")
-                                        fetch_count += 1
-                                        if fetch_count % 10 == 0:
-                                            await asyncio.sleep(1.0)
-                                    except Exception as e:
-                                        print(f"DEBUG: fetch_member 失敗: {e}")
-                            if user:
-                                print(f"DEBUG: 成功找到用戶: {user.display_name} (ID: {user.id})")
-                                mention_list.append(user.mention)
-                            else:
-                                print(f"DEBUG: 找不到用戶 ID {user_id}")
-                                mention_list.append(f"**ID:{participant_id}**")
-                        except ValueError:
-                            print(f"DEBUG: 非數字 ID，視為舊資料: {participant_id}")
-                            for member in ctx.guild.members:
-                                if (member.display_name == participant_id or 
-                                    member.name == participant_id):
-                                    user = member
-                                    mention_list.append(user.mention)
-                                    print(f"DEBUG: 名稱匹配成功: {user.display_name}")
-                                    break
-                            else:
-                                mention_list.append(f"**@{participant_id}**")
-                    
-                    if len(winners) == 1:
-                        winner_mentions = mention_list[0]
-                    elif len(winners) > 7:
-                        winner_mentions = ", ".join(mention_list[:3]) + " 等..."
-                    else:
-                        winner_mentions = ", ".join(mention_list[:-1]) + f" 和 {mention_list[-1]}"
-                    
-                    field_value = f"🎉 恭喜 {winner_mentions} 獲得！"
-                    if len(field_value) > 1024:
-                        field_value = field_value[:1020] + "..."
-                    embed.add_field(
-                        name=f"📦 {name}（{actual_winners}人）",
-                        value=field_value,
-                        inline=False
-                    )
-                except ValueError as e:
-                    print(f"DEBUG: 抽獎錯誤: {e}")
-                    embed.add_field(
-                        name=f"📦 {name}（{winner_count}人）",
-                        value="😢 參加者不足以抽出指定數量的得主。",
-                        inline=False
-                    )
-            
-            if name in prizes_data:
-                del prizes_data[name]
-                print(f"DEBUG: 已刪除獎品 {name}")
-        
-        # 檢查嵌入大小
-        embed_size = len(str(embed))
-        if embed_size > 6000:
-            logging.warning(f"抽獎頁 {page + 1} 嵌入過大: {embed_size} 字元")
-            embed = discord.Embed(
-                title=f"🎉 抽獎結果 (頁 {page + 1}/{total_pages})",
-                description="部分得獎名單過長，無法顯示完整內容。",
-                color=discord.Color.red()
-            )
-            embed.add_field(
-                name="⚠️ 警告",
-                value="請減少每項獎品的得獎者數量或聯繫管理員。",
-                inline=False
-            )
-        
-        embed.set_footer(text="請遵守抽獎規則！")
-        await ctx.send(embed=embed)
-        logging.debug(f"發送抽獎結果頁 {page + 1}, 字元數: {embed_size}")
-        if page < total_pages - 1:
-            await asyncio.sleep(0.2)  # 頁面間延遲
-    
-    save_prizes()
-    print("DEBUG: 抽獎完成")
+    with metrics.timer("draw.render"):
+        await send_draw_results(ctx, result)
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def migrate_names(ctx):
+    # 一次把所有舊資料名稱換成雪花 ID，之後不再需要以名稱比對成員
+    partition = await partition_for(ctx)
+    async with partition.lock:
+        migrated, unresolved = partition.store.migrate_legacy(lambda name: member_cache.find_by_name(ctx.guild, name))
+        if migrated:
+            partition.save()
+            await partition.persistence.flush()
+    msg = [f"✅ 已將 {migrated} 筆舊資料名稱轉換為 ID。"]
+    if unresolved:
+        msg.append(f"⚠️ {sum(len(v) for v in unresolved.values())} 筆無法解析：")
+        msg.extend(f"📦 {name}：{', '.join(names)}" for name, names in unresolved.items())
+    text = "\n".join(msg)
+    if len(text) > 2000:
+        # 清單過長時改以附件送出
+        data = text.encode('utf-8')
+        await send_file(ctx, msg[0] + "\n" + msg[1], lambda: discord.File(io.BytesIO(data), 'unresolved_names.txt'))
+    else:
+        await send(ctx, text)
+    logging.info("舊資料遷移：轉換 %s 筆，無法解析 %s 項獎品", migrated, len(unresolved))
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def event(ctx, *, event_id=None):
+    # 切換此頻道使用的活動分區；不帶參數時回到伺服器的預設分區
+    event_id = event_id.strip() if event_id else None
+    if event_id and not event_id.replace('-', '').replace('_', '').isalnum():
+        await send(ctx, "⚠️ 活動 ID 只能包含英數字、- 與 _。")
+        return
+    if event_id and len(event_id) > MAX_EVENT_ID:
+        # 活動 ID 會寫進按鈕的 custom_id（上限 100 字元）
+        await send(ctx, f"⚠️ 活動 ID 最多 {MAX_EVENT_ID} 個字元。")
+        return
+    if event_id:
+        active_events[ctx.channel.id] = event_id
+    else:
+        active_events.pop(ctx.channel.id, None)
+    partition = await partition_for(ctx)
+    await send(ctx, f"✅ 此頻道目前使用分區「{partition.label}」（{len(partition.store)} 個獎品）。")
 
 @bot.command()
 @commands.cooldown(1, 60, commands.BucketType.user)
@@ -572,99 +1049,174 @@ async def 啊偉(ctx):
         "啊～～～～～～偉～～～～～～～別裝酷啦，大家都在等你！",
         "啊～～～～～～偉～～～～～～～你的傳說級拖延症又發作了？"
     ]
-    await ctx.send(random.choice(responses))
+    await send(ctx, random.choice(responses))
 
 @bot.event
 async def on_member_join(member):
+    member_cache.on_member_update(member)
     welcome_message = "新成員進來請把名字改成遊戲裡的，方便識別，改完後請脫。"
     # Option 1: Send to a specific channel (replace CHANNEL_ID with your channel ID)
     channel = member.guild.get_channel(1301173686899838988)  # Replace CHANNEL_ID with actual ID
     if channel:
-        await channel.send(f"{member.mention} {welcome_message}")
+        await send(channel, f"{member.mention} {welcome_message}")
     else:
-        print(f"DEBUG: Welcome channel (ID: 1301173686899838988) not found")
+        logging.debug("Welcome channel (ID: 1301173686899838988) not found")
+
+@bot.event
+async def on_guild_join(guild):
+    await partitions.get(guild.id)
+    try:
+        await member_cache.prime(guild)
+    except Exception as e:
+        logging.error("預熱成員快取失敗 (%s): %s", guild.id, e)
+
+@bot.event
+async def on_member_update(before, after):
+    member_cache.on_member_update(after)
+
+@bot.event
+async def on_member_remove(member):
+    member_cache.on_member_remove(member)
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def cache_stats(ctx):
+    stats = member_cache.stats()
+    await send(
+        ctx,
+        f"🗂️ 成員快取：{stats['guilds']} 個伺服器，{stats['entries']} 筆\n"
+        f"命中 {stats['hits']} / 未命中 {stats['misses']}（命中率 {stats['hit_rate']:.1%}），"
+        f"已查詢 {stats['queried']} 個 ID"
+    )
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def stats(ctx):
+    # 各指令 / 按鈕 / 背景工作的延遲百分位數（毫秒）與計數器
+    pager = EmbedPager("📊 效能統計", description="延遲單位：毫秒（p50 / p95 / p99 / 最大值）")
+    lines = [
+        f"`{name}` ×{count}：{p50 * 1000:.1f} / {p95 * 1000:.1f} / {p99 * 1000:.1f} / {peak * 1000:.1f}"
+        for name, count, p50, p95, p99, peak in metrics.summary()
+    ]
+    pager.add_items("⏱️ 延遲", lines or ["尚無資料"], sep="\n")
+    counters = dict(metrics.counters)
+    counters.update({f"member_cache.{k}": v for k, v in member_cache.stats().items() if k != "hit_rate"})
+    counters.update({f"outbound.{k}": v for k, v in outbound.stats().items()})
+    counters.update({f"live_menus.{k}": v for k, v in live_menus.stats().items()})
+    counters.update({f"throttle.{k}": v for k, v in action_limiter.stats().items()})
+    pager.add_items("🔢 計數器", [f"`{k}`：{v}" for k, v in sorted(counters.items())], sep="\n")
+    await send_pages(ctx, pager)
+
+@bot.event
+async def on_command(ctx):
+    ctx.started_at = time.perf_counter()
+
+def observe_command(ctx, outcome):
+    started = getattr(ctx, 'started_at', None)
+    if started is not None and ctx.command is not None:
+        metrics.observe(f"command.{ctx.command.name}", time.perf_counter() - started)
+        metrics.incr(f"command.{ctx.command.name}.{outcome}")
+
+@bot.event
+async def on_command_completion(ctx):
+    observe_command(ctx, "ok")
 
 @bot.event
 async def on_command_error(ctx, error):
+    observe_command(ctx, "error")
     if isinstance(error, commands.MissingPermissions):
-        await ctx.send("❌ 你沒有權限使用這個指令。")
+        await send(ctx, "❌ 你沒有權限使用這個指令。")
     else:
-        print(f"DEBUG: 指令錯誤: {error}")
+        logging.debug("指令錯誤: %s", error)
         raise error
 
 @bot.event
 async def on_disconnect():
-    save_prizes()
+    await partitions.flush_all()
     print("👋 Bot 斷線，已保存資料")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def backup(ctx):
-    global prizes_data
-    if not isinstance(prizes_data, _builtin_dict):
-        logging.error(f"prizes_data 類型錯誤: {type(prizes_data)}, 內容: {prizes_data}")
-        await ctx.send("❌ 獎品資料異常，無法備份。")
+    prizes_data = (await partition_for(ctx)).store
+    if not isinstance(prizes_data, PrizeStore):
+        logging.error("prizes_data 類型錯誤: %s, 內容: %s", type(prizes_data), prizes_data)
+        await send(ctx, "❌ 獎品資料異常，無法備份。")
         return
     try:
-        # 確認檔案存在
-        json_path = 'prizes_data.json'
-        if not os.path.exists(json_path):
-            logging.error("prizes_data.json 不存在")
-            await ctx.send("❌ 找不到 prizes_data.json 檔案。")
-            return
+        # 直接序列化記憶體中的資料（日誌模式下快照檔可能尚未包含最新變更）
+        data = storage.snapshot_bytes(prizes_data.to_dict())
         
         # 發送檔案附件
-        with open(json_path, 'rb') as f:
-            await ctx.send("✅ 備份檔案：", file=discord.File(f, 'prizes_data_backup.json'))
+        await send_file(ctx, "✅ 備份檔案：", lambda: discord.File(io.BytesIO(data), 'prizes_data_backup.json'))
         
-        logging.debug(f"備份執行成功，用戶: {ctx.author.id}, 檔案大小: {os.path.getsize(json_path)} bytes")
+        logging.debug("備份執行成功，用戶: %s, 檔案大小: %s bytes", ctx.author.id, len(data))
     except Exception as e:
-        logging.error(f"備份錯誤: {e}")
-        await ctx.send(f"❌ 備份失敗：{e}")
+        logging.error("備份錯誤: %s", e)
+        await send(ctx, f"❌ 備份失敗：{e}")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
-async def restore(ctx):
-    global prizes_data
-    if not ctx.message.attachments:
-        await ctx.send("❌ 請上傳 prizes_data.json 檔案以進行還原。")
+async def restore(ctx, mode: str = 'replace'):
+    # replace：整份替換；merge：保留目前資料，參加者取聯集；dry-run：只顯示差異，不做任何變更
+    partition = await partition_for(ctx)
+    mode = mode.lower()
+    if mode not in restores.MODES:
+        await send(ctx, "❌ 還原模式必須是 replace、merge 或 dry-run。")
+        return
+    attachments = ctx.message.attachments
+    if not attachments:
+        await send(ctx, "❌ 請上傳 prizes_data.json 檔案以進行還原。")
         return
+    if not all(a.filename.endswith(restores.EXTENSIONS) for a in attachments):
+        await send(ctx, "❌ 請上傳備份檔案（.json、.json.gz 或 .snap）。")
+        return
+
+    # 串流下載到暫存檔，在執行緒中邊讀邊驗證、建立暫存的 PrizeStore；失敗時目前的資料完全不受影響
+    paths = []
     try:
-        # 獲取第一個附件
-        attachment = ctx.message.attachments[0]
-        if not attachment.filename.endswith('.json'):
-            await ctx.send("❌ 請上傳 JSON 格式的檔案。")
-            return
-        
-        # 下載並讀取檔案內容
-        file_content = await attachment.read()
-        prizes_data = json.loads(file_content.decode('utf-8'))
-        
-        # 驗證資料格式
-        if not isinstance(prizes_data, _builtin_dict):
-            logging.error(f"還原資料格式錯誤: {type(prizes_data)}")
-            await ctx.send("❌ 還原檔案格式錯誤，必須是 JSON 物件。")
-            return
-        for name, data in prizes_data.items():
-            if not (isinstance(name, _builtin_str) and 
-                    isinstance(data, _builtin_dict) and
-                    "participants" in data and 
-                    isinstance(data["participants"], _builtin_list) and
-                    "winners" in data and 
-                    isinstance(data["winners"], _builtin_int)):
-                logging.error(f"還原資料結構無效: {name}, data: {data}")
-                await ctx.send("❌ 還原檔案結構無效，請檢查格式。")
-                return
-        
-        # 保存到檔案
-        with open('prizes_data.json', 'w', encoding='utf-8') as f:
-            json.dump(prizes_data, f, ensure_ascii=False, indent=2)
-        
-        await ctx.send("✅ 資料還原成功！請使用 !show_prizes 檢查。")
-        logging.debug(f"還原成功，用戶: {ctx.author.id}, 獎品數: {len(prizes_data)}")
+        with metrics.timer("restore.stage"):
+            for attachment in attachments:
+                paths.append(await restores.download(attachment))
+            staged, note = await asyncio.to_thread(restores.stage, paths)
+    except ValueError as e:
+        logging.error("還原檔案無效: %s", e)
+        await send(ctx, f"❌ 還原檔案無效：{e}")
+        return
     except Exception as e:
-        logging.error(f"還原錯誤: {e}")
-        await ctx.send(f"❌ 還原失敗：{e}")
+        logging.error("還原錯誤: %s", e)
+        await send(ctx, f"❌ 還原失敗：{e}")
+        return
+    finally:
+        for path in paths:
+            os.remove(path)
+
+    try:
+        async with partition.lock:
+            store = partition.store
+            # 比對與合併期間凍結名單，避免加入 / 退出在替換時遺失
+            frozen = [] if mode == 'dry-run' else store.freeze()
+            try:
+                with metrics.timer("restore.plan"):
+                    result, changes = await asyncio.to_thread(restores.plan, store.rows(), staged, mode, store.next_id)
+            except BaseException:
+                store.thaw(frozen)
+                raise
+            if mode != 'dry-run':
+                # 寫入完整快照（並清空日誌），下次備份送完整快照
+                partition.replace(result)
+                await partition.persistence.flush()
+    except Exception as e:
+        logging.error("還原錯誤: %s", e)
+        await send(ctx, f"❌ 還原失敗：{e}")
+        return
+
+    detail = f"（{note}）" if note else ""
+    if mode == 'dry-run':
+        await send(ctx, f"🔍 還原預覽{detail}，尚未做任何變更：\n{changes.summary()}")
+        return
+    await send(ctx, f"✅ 資料還原成功（{mode}）{detail}！請使用 !show_prizes 檢查。\n{changes.summary()}")
+    logging.debug("還原成功，用戶: %s, 分區: %s, 模式: %s, 獎品數: %s", ctx.author.id, partition.label, mode, len(result))
 
-keep_alive.keep_alive()
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == '__main__':
+    bot.run(TOKEN)
\ No newline at end of file
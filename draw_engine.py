@@ -0,0 +1,187 @@
+import collections
+import random
+import secrets
+
+# draw_unique 每次尋找增廣路徑時最多檢查的參加者數，避免大型抽獎在名額補不滿時反覆掃描所有名單
+AUGMENT_LIMIT = 1_000_000
+
+
+class PrizeDraw:
+    __slots__ = ('name', 'winner_count', 'entrants', 'winners')
+
+    def __init__(self, name, winner_count, entrants, winners):
+        self.name = name
+        self.winner_count = winner_count  # 設定的得獎人數
+        self.entrants = entrants          # 參加人數
+        self.winners = winners            # 依抽中順序排列的參加者
+
+    @property
+    def unfilled(self):
+        return self.winner_count - len(self.winners)
+
+
+class DrawResult:
+    """一次抽獎的完整結果；以相同 seed 與相同名單重抽可得到相同結果。"""
+
+    __slots__ = ('seed', 'prizes', 'unique')
+
+    def __init__(self, seed, prizes, unique=False):
+        self.seed = seed
+        self.prizes = prizes
+        self.unique = unique  # 每人最多得一項獎品
+
+    @property
+    def unfilled(self):
+        # 有人參加但名額未補滿的獎品
+        return [p for p in self.prizes if p.entrants and p.unfilled > 0]
+
+    def winner_ids(self):
+        # 所有得主（去除重複），供渲染時一次解析名稱
+        seen = {}
+        for prize in self.prizes:
+            for winner in prize.winners:
+                seen[winner] = None
+        return list(seen)
+
+    def records(self):
+        mode = "unique" if self.unique else "independent"
+        return [{"op": "draw", "prize": p.name, "seed": self.seed, "mode": mode} for p in self.prizes]
+
+
+def sample_indices(rng, n, k):
+    """從 range(n) 不重複抽出 k 個索引，只消耗 O(k) 記憶體（k 接近 n 時改用部分洗牌）。"""
+    if k <= 0:
+        return []
+    if k * 3 > n:
+        pool = list(range(n))
+        for i in range(k):
+            j = rng.randrange(i, n)
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+    picked = {}
+    while len(picked) < k:
+        picked.setdefault(rng.randrange(n), None)
+    return list(picked)
+
+
+class Candidates:
+    """以延遲的 Fisher-Yates 洗牌依隨機順序產生 range(n) 的索引，只記錄被交換過的位置。"""
+
+    __slots__ = ('rng', 'n', 'i', 'swaps')
+
+    def __init__(self, rng, n):
+        self.rng = rng
+        self.n = n
+        self.i = 0
+        self.swaps = {}
+
+    def next(self):
+        i = self.i
+        if i >= self.n:
+            return None
+        j = self.rng.randrange(i, self.n)
+        swaps = self.swaps
+        picked = swaps.get(j, j)
+        swaps[j] = swaps.pop(i, i)
+        self.i = i + 1
+        return picked
+
+
+def draw_all(prize_rows, seed=None):
+    """對 [(名稱, 得獎人數, 參加者序列)] 一次抽出所有得主；參加者只需支援 len() 與索引。"""
+    if seed is None:
+        seed = secrets.randbits(64)
+    rng = random.Random(seed)
+    prizes = []
+    for name, winner_count, participants in prize_rows:
+        n = len(participants)
+        k = min(winner_count, n)
+        winners = [participants[i] for i in sample_indices(rng, n, k)]
+        prizes.append(PrizeDraw(name, winner_count, n, winners))
+    return DrawResult(seed, prizes)
+
+
+def draw_unique(prize_rows, seed=None, augment_limit=AUGMENT_LIMIT):
+    """每人最多得一項獎品，一次為所有獎品分配得主。
+
+    第一輪以隨機順序處理獎品，依隨機順序檢查候選人，已得獎者跳過、由下一位遞補。
+    第二輪為名額未滿的獎品尋找增廣路徑：把其他獎品的得主換過來，該獎品再從自己的參加者中
+    找未得獎者遞補，不足時繼續向下一項獎品借人。每次搜尋最多檢查 augment_limit 位參加者；
+    在此範圍內，只要存在讓所有名額都補滿的分配，就不會留下未補滿的名額。
+    額外記憶體只與抽出的人數成正比（得主 -> 獎品索引，以及各獎品洗牌的交換紀錄）。
+    """
+    if seed is None:
+        seed = secrets.randbits(64)
+    rng = random.Random(seed)
+    rows = list(prize_rows)
+    prizes = [PrizeDraw(name, winner_count, len(participants), []) for name, winner_count, participants in rows]
+    candidates = [Candidates(rng, len(participants)) for _, _, participants in rows]
+    owner = {}  # 得主 -> 獎品索引
+
+    def next_free(i):
+        participants = rows[i][2]
+        while True:
+            pos = candidates[i].next()
+            if pos is None:
+                return None
+            member = participants[pos]
+            if member not in owner:
+                return member
+
+    order = list(range(len(rows)))
+    rng.shuffle(order)
+    for i in order:
+        prize = prizes[i]
+        while prize.unfilled > 0:
+            member = next_free(i)
+            if member is None:
+                break
+            owner[member] = i
+            prize.winners.append(member)
+
+    dead = set()  # 上次成功遞補後，已確定無法再借到未得獎者的獎品
+
+    def augment(root):
+        # 以廣度優先搜尋從 root 出發的增廣路徑：parent[j] = (i, member) 表示 i 向 j 借走 member，j 需要遞補
+        if root in dead:
+            return False
+        parent = {root: None}
+        queue = collections.deque([root])
+        budget = augment_limit
+        while queue:
+            i = queue.popleft()
+            participants = rows[i][2]
+            shuffled = Candidates(rng, len(participants))
+            while budget > 0:
+                pos = shuffled.next()
+                if pos is None:
+                    break
+                budget -= 1
+                member = participants[pos]
+                j = owner.get(member)
+                if j is None:
+                    # 找到未得獎者：沿路徑把每一位被借走的得主換成下一位
+                    while parent[i] is not None:
+                        prev, taken = parent[i]
+                        winners = prizes[i].winners
+                        winners[winners.index(taken)] = member
+                        owner[member] = i
+                        i, member = prev, taken
+                    owner[member] = root
+                    prizes[root].winners.append(member)
+                    dead.clear()
+                    return True
+                if j not in parent and j not in dead:
+                    parent[j] = (i, member)
+                    queue.append(j)
+            if budget <= 0:
+                return False
+        # 搜尋範圍內沒有未得獎者；在下一次成功遞補之前，從這些獎品出發也找不到
+        dead.update(parent)
+        return False
+
+    for i in order:
+        # 搜尋失敗代表目前的分配已無法再為這項獎品多補一人
+        while prizes[i].unfilled > 0 and prizes[i].entrants and augment(i):
+            pass
+    return DrawResult(seed, prizes, unique=True)
@@ -0,0 +1,122 @@
+import discord
+
+# Discord 的嵌入限制
+MAX_FIELDS = 25
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+MAX_TITLE = 256
+MAX_TOTAL = 6000            # 同一則訊息內所有嵌入的字元總數
+MAX_EMBEDS_PER_MESSAGE = 10
+PAGE_LABEL_RESERVE = 16     # 預留給標題中「(頁 x/y)」的字元數
+
+
+class Field:
+    __slots__ = ('name', 'value', 'inline', 'key')
+
+    def __init__(self, name, value, inline=False, key=None):
+        self.name = name[:MAX_FIELD_NAME]
+        self.value = value
+        self.inline = inline
+        self.key = key   # 呼叫端自訂標記（例如獎品名稱），用來對應按鈕
+
+    def __len__(self):
+        return len(self.name) + len(self.value)
+
+
+def split_items(items, sep=", ", template="{}", limit=MAX_FIELD_VALUE):
+    """把項目依序裝進多個不超過 limit 字元的字串；單一過長項目才會被截斷。"""
+    overhead = len(template.format(""))
+    room = limit - overhead
+    chunks = []
+    current = []
+    size = 0
+    for item in items:
+        if len(item) > room:
+            item = item[:room - 3] + "..."
+        extra = len(item) + (len(sep) if current else 0)
+        if current and size + extra > room:
+            chunks.append(template.format(sep.join(current)))
+            current = []
+            size = 0
+            extra = len(item)
+        current.append(item)
+        size += extra
+    if current:
+        chunks.append(template.format(sep.join(current)))
+    return chunks
+
+
+class EmbedPager:
+    """依 Discord 的實際限制貪婪地把欄位裝進最少的嵌入與訊息。"""
+
+    def __init__(self, title, description=None, color=None, footer=None, max_fields=MAX_FIELDS):
+        self.title = title
+        self.description = description
+        self.color = color if color is not None else discord.Color.red()
+        self.footer = footer
+        self.max_fields = max_fields
+        self.fields = []
+
+    def add_field(self, name, value, inline=False, key=None):
+        self.fields.append(Field(name, value[:MAX_FIELD_VALUE], inline, key))
+
+    def add_items(self, name, items, sep=", ", template="{}", inline=False, key=None, continued="（續）"):
+        # 名單過長時拆成多個延續欄位，不截斷任何項目
+        for i, chunk in enumerate(split_items(items, sep, template)):
+            self.fields.append(Field(name if i == 0 else f"{name}{continued}", chunk, inline, key))
+
+    def _base_size(self):
+        return (min(len(self.title), MAX_TITLE - PAGE_LABEL_RESERVE) + PAGE_LABEL_RESERVE +
+                len(self.description or "") + len(self.footer or ""))
+
+    def pages(self):
+        """回傳每個嵌入的欄位清單；沒有欄位時仍回傳一頁。"""
+        base = self._base_size()
+        pages = []
+        current = []
+        size = base
+        for field in self.fields:
+            if current and (len(current) >= self.max_fields or size + len(field) > MAX_TOTAL):
+                pages.append(current)
+                current = []
+                size = base
+            current.append(field)
+            size += len(field)
+        pages.append(current)
+        return pages
+
+    def embeds(self):
+        """回傳 [(embed, 該頁欄位的 key 清單)]。"""
+        pages = self.pages()
+        total = len(pages)
+        title = self.title[:MAX_TITLE - PAGE_LABEL_RESERVE]
+        result = []
+        for number, fields in enumerate(pages, 1):
+            embed = discord.Embed(
+                title=f"{title} (頁 {number}/{total})" if total > 1 else title,
+                description=self.description,
+                color=self.color
+            )
+            for field in fields:
+                embed.add_field(name=field.name, value=field.value, inline=field.inline)
+            if self.footer:
+                embed.set_footer(text=self.footer)
+            result.append((embed, [f.key for f in fields]))
+        return result
+
+    def messages(self, max_embeds=MAX_EMBEDS_PER_MESSAGE):
+        """把嵌入合併成最少的訊息：每則最多 max_embeds 個嵌入，且總字元不超過 6000。"""
+        messages = []
+        current = []
+        size = 0
+        for embed, _ in self.embeds():
+            embed_size = len(embed)
+            if current and (len(current) >= max_embeds or size + embed_size > MAX_TOTAL):
+                messages.append(current)
+                current = []
+                size = 0
+            current.append(embed)
+            size += embed_size
+        if current:
+            messages.append(current)
+        return messages
@@ -0,0 +1,118 @@
+"""!export 的輸出管線：獎品 / 參加者 / 得獎紀錄 → 分批解析名稱 → CSV 或 JSONL 暫存檔 → 超過門檻時 gzip。
+
+每一段都是產生器，任何時刻記憶體中只有一批（BATCH_SIZE 筆）資料，與參加人數無關。
+"""
+
+import asyncio
+import csv
+import datetime
+import gzip
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+from member_cache import display_name
+from prize_store import ParticipantSet
+
+FORMATS = ('csv', 'jsonl')
+COLUMNS = ('type', 'prize', 'winners', 'user_id', 'display_name', 'rank', 'seed', 'mode', 'drawn_at')
+BATCH_SIZE = 1000
+GZIP_THRESHOLD = 4 << 20
+# 等級 9 的壓縮時間約為等級 6 的 4 倍，檔案只小幾個百分點
+GZIP_LEVEL = 6
+
+
+def snapshot_rows(prize_rows):
+    """在事件迴圈上複製每個獎品的名單（ID 陣列與舊名稱），之後匯出期間的加入 / 退出不影響輸出。
+
+    直接走訪即時的 ParticipantSet 時，退出會把走訪中的位置改成 0，加入也只會被部分納入。
+    SQLite 模式的 fetch_rows() 已回傳獨立的清單，不需再複製。
+    """
+    return [
+        (name, winners, itertools.chain(participants.id_array(), list(participants.legacy))
+         if isinstance(participants, ParticipantSet) else participants)
+        for name, winners, participants in prize_rows
+    ]
+
+
+def entries(prize_rows, draws, names=None):
+    """依序產生每個獎品、每位參加者與最近抽獎得主的資料列（尚未解析名稱）。
+
+    prize_rows 為 snapshot_rows() 的結果；draws 為 [(抽獎時間, DrawResult)]；names 不為 None 時只輸出這些獎品的得主。
+    """
+    for name, winners, participants in prize_rows:
+        yield {"type": "prize", "prize": name, "winners": winners}
+        for participant in participants:
+            yield {"type": "participant", "prize": name, "winners": winners, "member": participant}
+    for drawn_at, result in draws:
+        drawn_at = datetime.datetime.fromtimestamp(drawn_at, datetime.timezone.utc).isoformat()
+        mode = "unique" if result.unique else "independent"
+        for prize in result.prizes:
+            if names is not None and prize.name not in names:
+                continue
+            for rank, winner in enumerate(prize.winners, 1):
+                yield {
+                    "type": "winner", "prize": prize.name, "winners": prize.winner_count, "member": winner,
+                    "rank": rank, "seed": result.seed, "mode": mode, "drawn_at": drawn_at,
+                }
+
+
+async def resolved(rows, resolve, batch_size=BATCH_SIZE):
+    """每 batch_size 筆以 resolve(ids) -> {id: Member} 解析一次名稱，逐批產生資料列。"""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        members = await resolve([row["member"] for row in batch if "member" in row])
+        for row in batch:
+            if "member" in row:
+                member = row.pop("member")
+                # 舊資料以名稱保存，沒有 ID
+                row["user_id"] = str(member) if isinstance(member, int) else None
+                row["display_name"] = display_name(member, members)
+        yield batch
+
+
+def _writer(fmt, fp):
+    if fmt == 'csv':
+        writer = csv.DictWriter(fp, COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        return writer.writerows
+
+    def write_rows(rows):
+        fp.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+    return write_rows
+
+
+def _compress(path):
+    with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb', compresslevel=GZIP_LEVEL) as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+    return path + '.gz'
+
+
+async def write_file(fmt, batches, directory=None, gzip_threshold=GZIP_THRESHOLD):
+    """把 resolved() 的批次寫入暫存檔，回傳 (路徑, 筆數)；檔案超過 gzip_threshold 位元組時改為 .gz。
+
+    名稱解析在事件迴圈中進行，格式化與寫檔在執行緒中進行；呼叫端負責刪除回傳的檔案。
+    """
+    fd, path = tempfile.mkstemp(prefix='export_', suffix=f'.{fmt}', dir=directory)
+    count = 0
+    try:
+        # csv 模組要求 newline=''；utf-8-sig 讓試算表軟體正確辨識中文
+        with open(fd, 'w', encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='') as fp:
+            write_rows = _writer(fmt, fp)
+            async for batch in batches:
+                await asyncio.to_thread(write_rows, batch)
+                count += len(batch)
+        if os.path.getsize(path) > gzip_threshold:
+            path = await asyncio.to_thread(_compress, path)
+    except BaseException:
+        for leftover in (path, path + '.gz'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return path, count
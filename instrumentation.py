@@ -0,0 +1,103 @@
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(level=None):
+    # LOG_LEVEL 控制日誌量（DEBUG / INFO / WARNING / ERROR），預設 INFO
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
+    # discord.py 的 DEBUG 日誌量很大，除非明確要求否則維持 INFO
+    if level != 'DEBUG':
+        logging.getLogger('discord').setLevel(max(logging.INFO, logging.getLogger().level))
+
+
+class Histogram:
+    """保留最近 size 筆樣本計算百分位數，另記錄總次數、總和與最大值。"""
+
+    __slots__ = ('samples', 'count', 'total', 'max')
+
+    def __init__(self, size=2048):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentiles(self, *qs):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [0.0 for _ in qs]
+        last = len(ordered) - 1
+        return [ordered[min(last, int(q * len(ordered)))] for q in qs]
+
+
+class Metrics:
+    """各指令、按鈕與背景工作的延遲直方圖與計數器。"""
+
+    def __init__(self, sample_size=2048):
+        self.sample_size = sample_size
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(self.sample_size)
+        histogram.observe(seconds)
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, name):
+        # 可包住含 await 的區塊，量測實際經過時間；例外也會計入
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def summary(self):
+        """回傳 [(名稱, 次數, p50, p95, p99, 最大值)]，時間單位為秒。"""
+        rows = []
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            p50, p95, p99 = histogram.percentiles(0.50, 0.95, 0.99)
+            rows.append((name, histogram.count, p50, p95, p99, histogram.max))
+        return rows
+
+    def prometheus(self, gauges=None, prefix='drawbot'):
+        """以 Prometheus 文字格式輸出：延遲為 summary，計數器為 counter，gauges 為 {名稱: 數值}。"""
+        lines = [f"# TYPE {prefix}_latency_seconds summary"]
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            label = _label(name)
+            for q, value in zip(("0.5", "0.95", "0.99"), histogram.percentiles(0.50, 0.95, 0.99)):
+                lines.append(f'{prefix}_latency_seconds{{name="{label}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{prefix}_latency_seconds_count{{name="{label}"}} {histogram.count}')
+            lines.append(f'{prefix}_latency_seconds_sum{{name="{label}"}} {histogram.total:.6f}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name in sorted(self.counters):
+            lines.append(f'{prefix}_events_total{{name="{_label(name)}"}} {self.counters[name]}')
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+metrics = Metrics()
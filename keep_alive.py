@@ -1,15 +1,37 @@
-from flask import Flask
-from threading import Thread
+import json
+import logging
+import os
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def main():
-	return 'Bot is aLive!'
+HOST = os.getenv('HEALTH_HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '8080'))
 
-def run():
-    app.run(host="0.0.0.0", port=8080)
 
-def keep_alive():
-    server = Thread(target=run)
-    server.start()
\ No newline at end of file
+async def start(health, metrics_text, host=HOST, port=PORT):
+    """在 bot 自己的事件迴圈中啟動 HTTP 伺服器；health() 回傳 (是否健康, dict)，metrics_text() 回傳 Prometheus 文字。"""
+
+    async def index(request):
+        # 舊的 uptime 監控仍然打 /
+        return web.Response(text='Bot is aLive!')
+
+    async def healthz(request):
+        ok, body = health()
+        return web.Response(
+            text=json.dumps(body, ensure_ascii=False),
+            status=200 if ok else 503,
+            content_type='application/json'
+        )
+
+    async def metrics(request):
+        return web.Response(text=metrics_text(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/', index)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/metrics', metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info("健康檢查伺服器已啟動：http://%s:%s", host, port)
+    return runner
@@ -0,0 +1,103 @@
+import asyncio
+import collections
+import logging
+import time
+
+from instrumentation import metrics
+
+
+class _Menu:
+    __slots__ = ('label', 'names', 'refresh', 'created', 'last_edit', 'task')
+
+    def __init__(self, label, names, refresh):
+        self.label = label
+        self.names = names
+        self.refresh = refresh
+        self.created = time.monotonic()
+        self.last_edit = 0.0
+        self.task = None
+
+
+class LiveMenus:
+    """記錄 !show_prizes 發出的訊息，參加人數變更時就地更新。
+
+    每則訊息最多只有一個等待中的編輯：第一筆變更後等 settle 秒，且距離上次編輯至少 interval 秒；
+    等待期間的其他變更直接併入同一次編輯，所以每秒數百次加入只會產生少數幾次編輯。
+    """
+
+    def __init__(self, interval=5.0, settle=1.0, max_messages=500, ttl=86400):
+        self.interval = interval
+        self.settle = settle
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self._menus = collections.OrderedDict()   # 訊息 ID -> _Menu，依追蹤先後排序
+        self._by_prize = {}                       # (分區, 獎品名稱) -> {訊息 ID}
+        self.edits = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._menus)
+
+    def track(self, partition, message_id, names, refresh):
+        """refresh() 以目前的資料編輯訊息；回傳 False 表示訊息已不存在，停止追蹤。"""
+        self.untrack(message_id)
+        self._menus[message_id] = _Menu(partition.label, list(names), refresh)
+        for name in names:
+            self._by_prize.setdefault((partition.label, name), set()).add(message_id)
+        while len(self._menus) > self.max_messages:
+            self.untrack(next(iter(self._menus)))
+
+    def untrack(self, message_id):
+        menu = self._menus.pop(message_id, None)
+        if menu is None:
+            return
+        if menu.task is not None:
+            menu.task.cancel()
+        for name in menu.names:
+            ids = self._by_prize.get((menu.label, name))
+            if ids is not None:
+                ids.discard(message_id)
+                if not ids:
+                    del self._by_prize[(menu.label, name)]
+
+    def touch(self, partition, records=()):
+        """標記受變更影響的訊息；records 空白（整份替換）時更新該分區的所有訊息。"""
+        if records:
+            ids = set()
+            for record in records:
+                ids.update(self._by_prize.get((partition.label, record.get("prize")), ()))
+        else:
+            ids = [i for i, menu in self._menus.items() if menu.label == partition.label]
+        now = time.monotonic()
+        for message_id in ids:
+            menu = self._menus[message_id]
+            if now - menu.created > self.ttl:
+                self.untrack(message_id)
+            elif menu.task is not None:
+                self.coalesced += 1
+            else:
+                menu.task = asyncio.get_running_loop().create_task(self._edit_later(message_id, menu))
+
+    async def _edit_later(self, message_id, menu):
+        await asyncio.sleep(max(self.settle, menu.last_edit + self.interval - time.monotonic()))
+        # 從這裡開始的變更會排入下一次編輯
+        menu.task = None
+        menu.last_edit = time.monotonic()
+        try:
+            with metrics.timer("menu.edit"):
+                alive = await menu.refresh()
+        except Exception as e:
+            logging.error("更新獎品清單訊息 %s 失敗: %s", message_id, e)
+            return
+        if alive is False:
+            self.untrack(message_id)
+            return
+        self.edits += 1
+
+    def stats(self):
+        return {
+            "tracked": len(self._menus),
+            "pending": sum(1 for menu in self._menus.values() if menu.task is not None),
+            "edits": self.edits,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from instrumentation import metrics
+
+
+class GuildMemberCache:
+    """單一伺服器的 user_id -> Member 快取，LRU 淘汰並設有存活時間；None 代表已確認不在伺服器。"""
+
+    def __init__(self, max_size=50000, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (member 或 None, 到期時間)
+        self._names = {}               # name / display_name -> user_id（不受 LRU 淘汰影響）
+        self._name_keys = {}           # user_id -> 目前登記在 _names 的名稱
+        self.indexed = False
+
+    def lookup(self, user_id):
+        # 回傳 (是否命中, member)；過期的項目視為未命中
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False, None
+        member, expires = entry
+        if expires < time.monotonic():
+            del self._entries[user_id]
+            return False, None
+        self._entries.move_to_end(user_id)
+        return True, member
+
+    def put(self, user_id, member):
+        self._entries[user_id] = (member, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def remove(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def index_name(self, member):
+        # 改名時先移除舊名稱；同名時保留先登記的成員
+        self.unindex_name(member.id)
+        keys = (member.name, member.display_name)
+        for key in keys:
+            self._names.setdefault(key, member.id)
+        self._name_keys[member.id] = keys
+
+    def unindex_name(self, user_id):
+        for key in self._name_keys.pop(user_id, ()):
+            if self._names.get(key) == user_id:
+                del self._names[key]
+
+    def find_name(self, name):
+        return self._names.get(name)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MemberCache:
+    """所有指令共用的成員快取：啟動時以 chunk 預熱，成員事件即時更新，未命中的 ID 批次查詢。"""
+
+    QUERY_BATCH = 100  # query_members 每次最多 100 個 ID
+
+    def __init__(self, max_size=50000, ttl=600, scheduler=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.scheduler = scheduler   # OutboundScheduler；None 時直接查詢
+        self.hits = 0
+        self.misses = 0
+        self.queried = 0   # 送往 Discord 查詢的 ID 數
+        self._guilds = {}
+
+    def _cache(self, guild_id):
+        cache = self._guilds.get(guild_id)
+        if cache is None:
+            cache = self._guilds[guild_id] = GuildMemberCache(self.max_size, self.ttl)
+        return cache
+
+    async def prime(self, guild):
+        if not guild.chunked:
+            await self._gateway(lambda: guild.chunk(cache=True))
+        cache = self._cache(guild.id)
+        for member in guild.members:
+            cache.put(member.id, member)
+        self._build_name_index(guild, cache)
+        logging.debug("成員快取已預熱：%s %s 人", guild.name, len(cache))
+
+    def _build_name_index(self, guild, cache):
+        for member in guild.members:
+            cache.index_name(member)
+        cache.indexed = True
+
+    def on_member_update(self, member):
+        # 加入與資料更新都直接覆寫，顯示名稱永遠是最新的
+        cache = self._cache(member.guild.id)
+        cache.put(member.id, member)
+        cache.index_name(member)
+
+    def on_member_remove(self, member):
+        cache = self._cache(member.guild.id)
+        cache.put(member.id, None)
+        cache.unindex_name(member.id)
+
+    def find_by_name(self, guild, name):
+        """以 name 或 display_name 查詢成員 ID，O(1)；找不到時回傳 None。"""
+        cache = self._cache(guild.id)
+        if not cache.indexed:
+            self._build_name_index(guild, cache)
+        return cache.find_name(name)
+
+    async def resolve(self, guild, participant_ids):
+        """回傳 {participant_id: Member}；找不到的參加者不會出現在結果中。"""
+        cache = self._cache(guild.id)
+        members = {}
+        missing = []
+        legacy = []
+        for participant_id in participant_ids:
+            if isinstance(participant_id, str):
+                legacy.append(participant_id)
+                continue
+            hit, member = cache.lookup(participant_id)
+            if hit:
+                self.hits += 1
+                if member is not None:
+                    members[participant_id] = member
+                continue
+            self.misses += 1
+            # discord.py 本身的成員快取不需要 API 呼叫
+            member = guild.get_member(participant_id)
+            if member is not None:
+                cache.put(participant_id, member)
+                members[participant_id] = member
+            else:
+                missing.append(participant_id)
+        if missing:
+            with metrics.timer("member_fetch"):
+                await self._query(guild, cache, missing, members)
+        for name in legacy:
+            # 舊資料以名稱保存，透過名稱索引查詢
+            user_id = self.find_by_name(guild, name)
+            member = guild.get_member(user_id) if user_id is not None else None
+            if member is not None:
+                members[name] = member
+        return members
+
+    async def _query(self, guild, cache, missing, members):
+        # 去除重複後以每批 100 個 ID 並行查詢
+        missing = list(dict.fromkeys(missing))
+        self.queried += len(missing)
+        batches = [missing[i:i + self.QUERY_BATCH] for i in range(0, len(missing), self.QUERY_BATCH)]
+        results = await asyncio.gather(
+            *(self._gateway(lambda batch=batch: guild.query_members(user_ids=batch, limit=len(batch), cache=True))
+              for batch in batches),
+            return_exceptions=True
+        )
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                logging.error("query_members 失敗: %s", result)
+                continue
+            found = {member.id: member for member in result}
+            for user_id in batch:
+                member = found.get(user_id)
+                # 查無此人也記錄下來，避免重複查詢；之後加入時 on_member_join 會覆寫
+                cache.put(user_id, member)
+                if member is not None:
+                    members[user_id] = member
+
+    async def _gateway(self, action):
+        # chunk / query_members 走 gateway，與其他輸出共用排程器的限流
+        if self.scheduler is None:
+            return await action()
+        return await self.scheduler.run(("gateway",), action)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "guilds": len(self._guilds),
+            "entries": sum(len(c) for c in self._guilds.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "queried": self.queried,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def display_name(participant_id, members):
+    member = members.get(participant_id)
+    if member:
+        return member.display_name
+    if isinstance(participant_id, str):
+        return participant_id
+    return f"ID:{participant_id}"
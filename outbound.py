@@ -0,0 +1,149 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+# 優先權通道：數字越小越先送出
+LANE_INTERACTIVE = 0   # 互動回應（3 秒期限）
+LANE_NORMAL = 1        # 一般指令回覆
+LANE_BULK = 2          # 抽獎結果頁、備份等大量輸出
+
+# 路由種類 -> (次數, 秒數)；未列出的種類使用 default
+ROUTE_LIMITS = {
+    "channel": (5, 5.0),
+    "followup": (5, 2.0),
+    "dm": (5, 5.0),
+    "gateway": (120, 60.0),
+    "default": (5, 1.0),
+}
+GLOBAL_LIMIT = (50, 1.0)
+# 不經過任何權杖桶的路由：互動回應不計入 Discord 的全域限制，每個互動也只會回應一次，
+# 排隊只會讓回應超過 3 秒期限
+UNLIMITED_ROUTES = {"interaction"}
+
+
+class TokenBucket:
+    """權杖桶；等待中的請求依 (通道, 先後) 取得權杖，高優先權可插隊。"""
+
+    def __init__(self, rate, per):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._waiters = []   # heap of (lane, seq, future)
+        self._pump = None
+
+    def _delay(self):
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.fill_rate
+
+    async def acquire(self, lane, seq):
+        if not self._waiters and self._delay() == 0:
+            self.tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, seq, future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._run())
+        await future
+
+    async def _run(self):
+        while self._waiters:
+            delay = self._delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # 等待者已取消
+            self.tokens -= 1
+            future.set_result(None)
+
+    def pause(self, retry_after):
+        # 收到 429 後在 retry_after 秒內不再發出請求
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.tokens = 0.0
+
+    @property
+    def pending(self):
+        return len(self._waiters)
+
+    def idle(self):
+        return not self._waiters and self._delay() == 0 and self.tokens >= self.capacity
+
+
+class OutboundScheduler:
+    """所有對 Discord 的輸出都經過這裡：每個路由一個權杖桶，加上全域桶，依通道優先權排隊。"""
+
+    MAX_BUCKETS = 1000
+
+    def __init__(self, route_limits=None, global_limit=GLOBAL_LIMIT, retries=3):
+        self.route_limits = dict(ROUTE_LIMITS, **(route_limits or {}))
+        self.global_bucket = TokenBucket(*global_limit)
+        self.retries = retries
+        self.sent = 0
+        self.rate_limited = 0   # 實際收到的 429 次數
+        self._buckets = {}
+        self._seq = itertools.count()
+
+    def _bucket(self, route):
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                # 清掉閒置且已補滿的桶，避免路由無限增長
+                for key in [k for k, b in self._buckets.items() if b.idle()]:
+                    del self._buckets[key]
+            limit = self.route_limits.get(route[0], self.route_limits["default"])
+            bucket = self._buckets[route] = TokenBucket(*limit)
+        return bucket
+
+    async def run(self, route, action, lane=LANE_NORMAL):
+        """依路由限流後執行 action()（回傳 awaitable 的函式），遇到 429 依回應標頭暫停後重試。"""
+        bucket = None if route[0] in UNLIMITED_ROUTES else self._bucket(route)
+        for attempt in range(self.retries + 1):
+            if bucket is not None:
+                seq = next(self._seq)
+                await bucket.acquire(lane, seq)
+                await self.global_bucket.acquire(lane, seq)
+            try:
+                result = await action()
+            except Exception as e:
+                if getattr(e, 'status', None) != 429 or attempt == self.retries:
+                    raise
+                self.rate_limited += 1
+                retry_after, is_global = self._retry_after(e)
+                logging.warning("路由 %s 被限流，%.2f 秒後重試", route, retry_after)
+                if bucket is None:
+                    await asyncio.sleep(retry_after)  # 沒有權杖桶可暫停，直接等待後重試
+                else:
+                    (self.global_bucket if is_global else bucket).pause(retry_after)
+                continue
+            self.sent += 1
+            return result
+
+    @staticmethod
+    def _retry_after(error):
+        # discord.py 的 HTTPException 保留原始回應，從限流標頭取得等待時間
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        retry_after = headers.get('Retry-After') or headers.get('X-RateLimit-Reset-After') or 1.0
+        try:
+            retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            retry_after = 1.0
+        return retry_after, headers.get('X-RateLimit-Global') == 'true'
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "rate_limited": self.rate_limited,
+            "buckets": len(self._buckets),
+            "queued": self.global_bucket.pending + sum(b.pending for b in self._buckets.values()),
+        }
@@ -0,0 +1,190 @@
+import asyncio
+import collections
+import logging
+import os
+
+import storage
+from backup import BackupScheduler
+from persistence import PersistenceWorker
+from prize_store import PrizeStore
+
+LEGACY_MARKER = 'prizes_data.migrated'
+# 每個分區在記憶體中保留的最近抽獎結果數（供 !export 匯出得獎名單）
+DRAW_HISTORY = 20
+
+
+class PrizePartition:
+    """單一伺服器（可再細分活動）的獎品狀態：獨立的儲存檔、保存 worker、備份排程與鎖。"""
+
+    def __init__(self, guild_id, event, mode, send_backup, settings, scheduler=None, menus=None):
+        self.guild_id = guild_id
+        self.event = event
+        self.label = f"{guild_id}_{event}" if event else str(guild_id)
+        self.mode = mode
+        self.store = PrizeStore()
+        self.storage = storage.create_storage(mode, self.label)
+        # 跨 await 的變更（新增、抽獎、還原）持有此鎖；不同分區互不等待
+        self.lock = asyncio.Lock()
+        self.persistence = PersistenceWorker(
+            self.storage, lambda: self.store,
+            max_delay=settings["save_max_delay"], max_batch=settings["save_max_batch"], on_saved=self._on_saved
+        )
+        self.backups = BackupScheduler(
+            send_backup, lambda: self.store,
+            cooldown=settings["backup_cooldown"], full_every=settings["backup_full_every"], label=self.label
+        )
+        self.compact_interval = settings["journal_compact_interval"]
+        self._compaction_task = None
+        self.scheduler = scheduler  # 定時截止 / 抽獎；堆積由獎品資料中的排程時間重建
+        self.menus = menus          # 已發出的獎品清單訊息，參加人數變更時就地更新
+        self.draws = collections.deque(maxlen=DRAW_HISTORY)  # [(抽獎時間, DrawResult)]，不寫入儲存檔
+
+    def _on_saved(self):
+        logging.debug("💾 [%s] 已保存 %s 個獎品資料", self.label, len(self.store))
+
+    def load(self):
+        # 回傳是否找到既有資料；只做檔案 I/O 與建立 PrizeStore，可在執行緒中呼叫
+        try:
+            loaded = self.storage.load()
+        except Exception as e:
+            print(f"❌ [{self.label}] 載入資料失敗: {e}")
+            return False
+        if loaded is None:
+            return False
+        self.store = loaded
+        logging.debug("[%s] 已載入 %s 個獎品資料", self.label, len(self.store))
+        return True
+
+    def start(self):
+        self.persistence.start()
+        self.backups.start()
+        if self.mode == 'journal' and self._compaction_task is None:
+            self._compaction_task = asyncio.get_running_loop().create_task(self._compact_loop())
+        if self.storage.stale:
+            # 快照不是目前設定的格式（例如舊的 prizes_data.json）：改寫一次，內容未變所以不送備份
+            self.persistence.request_snapshot()
+
+    async def _compact_loop(self):
+        # 背景定期把日誌壓縮回快照
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            if self.storage.pending_records and await self.persistence.flush(snapshot=True):
+                logging.debug("[%s] 日誌已壓縮為快照", self.label)
+
+    def save(self, *records):
+        # 只標記變更，由背景 worker 合併後在執行緒中寫入；records 空白時寫入完整快照
+        if records:
+            self.persistence.mark_dirty(*records)
+        else:
+            self.persistence.request_snapshot()
+        self.backups.mark_dirty(*records)
+        if self.menus is not None:
+            self.menus.touch(self, records)
+
+    def replace(self, store):
+        # 還原、匯入時整份替換，下次保存與備份都是完整快照
+        self.store = store
+        self.save()
+        self.track_schedule()
+
+    def track_schedule(self):
+        if self.scheduler is not None:
+            self.scheduler.track(self)
+
+    async def fetch_rows(self, names=None):
+        """回傳 [(名稱, 得獎人數, 參加者序列)]。"""
+        if self.mode == 'sqlite':
+            # 先把尚未寫入的變更落地，再只查詢需要的列
+            await self.persistence.flush()
+            return await asyncio.to_thread(self.storage.fetch_prizes, names)
+        store = self.store
+        if names is None:
+            names = store.names()
+        return [(n, store[n].winners, store[n].participants) for n in names if n in store]
+
+
+class PartitionManager:
+    """(guild_id, event) -> PrizePartition，第一次使用時載入。"""
+
+    def __init__(self, mode, send_backup, settings, legacy_guild_id=None, scheduler=None, menus=None):
+        self.mode = mode
+        self.send_backup = send_backup
+        self.settings = settings
+        self.legacy_guild_id = legacy_guild_id
+        self.scheduler = scheduler
+        self.menus = menus
+        self._partitions = {}
+        self._loading = {}   # 載入中的 (guild_id, event) -> Future
+        self._legacy_lock = asyncio.Lock()
+        self._started = False
+
+    async def get(self, guild_id, event=None):
+        """回傳分區；第一次使用時在執行緒中載入，同一分區同時被要求時共用同一次載入。"""
+        key = (guild_id, event or None)
+        partition = self._partitions.get(key)
+        if partition is not None:
+            return partition
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = self._loading[key] = asyncio.ensure_future(self._load(key))
+        # 呼叫端被取消時載入仍繼續，其他等待者照常取得分區
+        return await asyncio.shield(loading)
+
+    async def load_all(self, guild_ids):
+        """並行載入尚未載入的伺服器預設分區，避免大型快照阻塞事件迴圈。"""
+        await asyncio.gather(*(self.get(guild_id) for guild_id in dict.fromkeys(guild_ids)))
+
+    async def _load(self, key):
+        try:
+            partition = self._create(*key)
+            loaded = await asyncio.to_thread(partition.load)
+            if not loaded and partition.event is None:
+                await self._claim_legacy(partition)
+            self._register(key, partition)
+            return partition
+        finally:
+            del self._loading[key]
+
+    def _create(self, guild_id, event):
+        return PrizePartition(guild_id, event, self.mode, self.send_backup, self.settings, self.scheduler, self.menus)
+
+    def _register(self, key, partition):
+        self._partitions[key] = partition
+        partition.track_schedule()
+        if self._started:
+            partition.start()
+
+    async def _claim_legacy(self, partition):
+        # 分區化之前的 prizes_data.json 等資料只遷移一次：交給 LEGACY_GUILD_ID，未設定時交給第一個載入的伺服器
+        if self.legacy_guild_id is not None and int(self.legacy_guild_id) != partition.guild_id:
+            return
+        # 多個分區同時載入時只讓一個遷移
+        async with self._legacy_lock:
+            if os.path.exists(LEGACY_MARKER):
+                return
+            try:
+                legacy = await asyncio.to_thread(lambda: storage.create_storage(self.mode).load())
+            except Exception as e:
+                print(f"❌ 讀取舊資料失敗: {e}")
+                return
+            if legacy is None:
+                return
+            partition.replace(legacy)
+            # 分區檔寫入成功後才建立標記；否則崩潰後標記在、分區檔不在，舊資料就不會再被遷移
+            if not await partition.persistence.flush(snapshot=True):
+                print(f"❌ 無法寫入分區 {partition.label}，下次啟動時重新遷移舊資料")
+                return
+            with open(LEGACY_MARKER, 'w', encoding='utf-8') as f:
+                f.write(partition.label)
+        print(f"ℹ️ 已將舊資料（{len(legacy)} 個獎品）遷移到分區 {partition.label}")
+
+    def start(self):
+        self._started = True
+        for partition in self._partitions.values():
+            partition.start()
+
+    def values(self):
+        return list(self._partitions.values())
+
+    async def flush_all(self):
+        await asyncio.gather(*(p.persistence.flush() for p in self._partitions.values()))
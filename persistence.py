@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+from instrumentation import metrics
+
+
+class PersistenceWorker:
+    """把多次變更合併成一次寫入，並在執行緒中完成檔案 I/O，不阻塞事件迴圈。"""
+
+    def __init__(self, storage, get_store, max_delay=1.0, max_batch=500, on_saved=None):
+        self.storage = storage
+        self.get_store = get_store      # 回傳目前的 PrizeStore（還原後物件會被替換）
+        self.max_delay = max_delay      # 第一筆變更後最多等待多久就寫入
+        self.max_batch = max_batch      # 累積多少筆紀錄就立即寫入
+        self.on_saved = on_saved
+        self._pending = []
+        self._force_snapshot = False
+        self._dirty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def mark_dirty(self, *records):
+        self._pending.extend(records)
+        self._dirty.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+
+    def request_snapshot(self):
+        self._force_snapshot = True
+        self.mark_dirty()
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            # 等待更多變更合併，直到超過延遲或批次已滿
+            try:
+                await asyncio.wait_for(self._full.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            if not await self._write():
+                await asyncio.sleep(self.max_delay)
+
+    async def _write(self):
+        async with self._write_lock:
+            if not self._dirty.is_set():
+                return True
+            records = self._pending
+            self._pending = []
+            force = self._force_snapshot
+            self._force_snapshot = False
+            self._dirty.clear()
+            self._full.clear()
+
+            snapshot = None
+            if force or self.storage.wants_snapshot(records):
+                # 在事件迴圈上複製資料，序列化與寫檔交給執行緒
+                snapshot = self.storage.capture(self.get_store())
+            try:
+                with metrics.timer("save"):
+                    await asyncio.to_thread(self.storage.save, records, snapshot)
+            except Exception as e:
+                logging.error("保存資料失敗：%s", e)
+                # 放回佇列等待下次重試
+                self._pending[:0] = records
+                self._force_snapshot = self._force_snapshot or force
+                self._dirty.set()
+                return False
+        metrics.incr("save.records", len(records))
+        if self.on_saved:
+            self.on_saved()
+        return True
+
+    async def flush(self, snapshot=False):
+        # 供斷線 / 關機時呼叫：立即寫入所有尚未保存的變更
+        if snapshot:
+            self._force_snapshot = True
+            self._dirty.set()
+        return await self._write()
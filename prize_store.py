@@ -0,0 +1,366 @@
+import array
+import time
+
+# array('q') 可保存的最大值；0 是退出後留下的空位標記，不能當作 ID
+MAX_ID = 2 ** 63 - 1
+
+class ParticipantSet:
+    """以 array('q') 保存雪花 ID 的有序集合，加入 / 退出 / 查詢皆為 O(1)。"""
+
+    __slots__ = ('_ids', '_index', '_holes', 'legacy')
+
+    def __init__(self, members=()):
+        self._ids = array.array('q')
+        self._index = {}   # user_id -> 在 _ids 中的位置；None 代表尚未建立
+        self._holes = 0    # 已退出但尚未壓縮的空位（以 0 標記）
+        self.legacy = []   # 舊資料中無法轉成 ID 的名稱
+        for member in members:
+            self.add(member)
+
+    @classmethod
+    def from_array(cls, ids, legacy=()):
+        """直接採用快照中的 ID 陣列；索引延後到第一次加入 / 退出 / 查詢時才建立。"""
+        participants = cls()
+        participants._ids = ids
+        participants._index = None
+        participants.legacy = list(legacy)
+        return participants
+
+    def _indexed(self):
+        index = self._index
+        if index is None:
+            index = {user_id: pos for pos, user_id in enumerate(self._ids)}
+            if len(index) != len(self._ids) or 0 in index:
+                # 快照中有重複或無效的 ID：只保留第一次出現的有效 ID
+                ids = array.array('q')
+                index = {}
+                for user_id in self._ids:
+                    if user_id and user_id not in index:
+                        index[user_id] = len(ids)
+                        ids.append(user_id)
+                self._ids = ids
+            self._index = index
+        return index
+
+    @staticmethod
+    def _coerce(member):
+        # 只有 1..2**63-1 的純 ASCII 數字字串才視為 ID；其他（含 "0"、超長數字、"+1"、" 1"）保留為舊名稱
+        if isinstance(member, str):
+            if not (member.isascii() and member.isdigit()):
+                return None
+            member = int(member)
+        elif not isinstance(member, int) or isinstance(member, bool):
+            return None
+        return member if 0 < member <= MAX_ID else None
+
+    def add(self, member):
+        user_id = self._coerce(member)
+        if user_id is None:
+            if isinstance(member, int):
+                member = str(member)  # 超出範圍的 ID 以字串保存，快照才能編碼
+            if member in self.legacy:
+                return False
+            self.legacy.append(member)
+            return True
+        index = self._indexed()
+        if user_id in index:
+            return False
+        index[user_id] = len(self._ids)
+        self._ids.append(user_id)
+        return True
+
+    def discard(self, member):
+        user_id = self._coerce(member)
+        if user_id is None:
+            if member in self.legacy:
+                self.legacy.remove(member)
+                return True
+            return False
+        pos = self._indexed().pop(user_id, None)
+        if pos is None:
+            return False
+        self._ids[pos] = 0
+        self._holes += 1
+        # 空位過半時一次壓縮，攤銷後仍為 O(1)
+        if self._holes > 32 and self._holes * 2 > len(self._ids):
+            self._compact()
+        return True
+
+    def _compact(self):
+        ids = array.array('q', (i for i in self._ids if i))
+        self._ids = ids
+        self._index = {user_id: pos for pos, user_id in enumerate(ids)}
+        self._holes = 0
+
+    def __contains__(self, member):
+        user_id = self._coerce(member)
+        if user_id is None:
+            return member in self.legacy
+        return user_id in self._indexed()
+
+    def __len__(self):
+        return len(self._ids) - self._holes + len(self.legacy)
+
+    def __bool__(self):
+        return len(self._ids) > self._holes or bool(self.legacy)
+
+    def __iter__(self):
+        if self._holes:
+            yield from (i for i in self._ids if i)
+        else:
+            yield from self._ids
+        yield from self.legacy
+
+    def __getitem__(self, pos):
+        # 依加入順序取第 pos 位參加者；有空位時先壓縮，讓索引抽樣不需複製整份名單
+        if self._holes:
+            self._compact()
+        if pos < 0:
+            pos += len(self)
+        if pos < len(self._ids):
+            return self._ids[pos]
+        return self.legacy[pos - len(self._ids)]
+
+    def to_list(self):
+        return list(self)
+
+    def id_array(self):
+        # 只含有效 ID 的陣列副本（無空位時為一次記憶體複製）
+        if self._holes:
+            self._compact()
+        return array.array('q', self._ids)
+
+    def resolve_legacy(self, lookup):
+        """以 lookup(名稱) -> user_id 把舊資料名稱換成 ID，回傳仍無法解析的名稱。"""
+        unresolved = []
+        index = self._indexed()
+        for name in self.legacy:
+            user_id = lookup(name)
+            if user_id is None:
+                unresolved.append(name)
+            elif user_id not in index:
+                index[user_id] = len(self._ids)
+                self._ids.append(user_id)
+        self.legacy = unresolved
+        return unresolved
+
+
+def read_schedule(info):
+    """從 prizes_data.json 的獎品項目讀出 (截止時間, 抽獎時間, 公告頻道)，格式不符的欄位視為未設定。"""
+    def number(key):
+        value = info.get(key)
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+    channel = info.get("channel")
+    return number("close_at"), number("draw_at"), channel if isinstance(channel, int) else None
+
+
+# prizes_data.json 中保存下一個獎品 ID 的保留鍵；舊版讀取時會當成結構無效的項目略過
+NEXT_ID_KEY = "__next_id__"
+
+
+def read_prize_id(info):
+    prize_id = info.get("id")
+    return prize_id if isinstance(prize_id, int) and not isinstance(prize_id, bool) and prize_id > 0 else None
+
+
+class Prize:
+    __slots__ = ('id', 'name', 'winners', 'participants', 'closed', 'close_at', 'draw_at', 'channel_id')
+
+    def __init__(self, name, winners=1, participants=()):
+        self.id = None  # 由 PrizeStore 指派的短整數 ID，按鈕的 custom_id 以此識別獎品
+        self.name = name
+        self.winners = winners
+        self.participants = ParticipantSet(participants)
+        self.closed = False  # 抽獎進行中：名單凍結，不再接受加入 / 退出
+        self.close_at = None    # 報名截止時間（epoch 秒）
+        self.draw_at = None     # 自動抽獎時間（epoch 秒）
+        self.channel_id = None  # 截止公告與抽獎結果要發到的頻道
+
+    @property
+    def schedule(self):
+        return self.close_at, self.draw_at, self.channel_id
+
+    @schedule.setter
+    def schedule(self, value):
+        self.close_at, self.draw_at, self.channel_id = value
+
+    def to_dict(self):
+        # 保持與舊版 prizes_data.json 相同的格式（ID 以字串保存）；排程欄位只在設定時寫入
+        data = {
+            "participants": [str(p) for p in self.participants],
+            "winners": self.winners,
+            "id": self.id
+        }
+        if self.close_at is not None:
+            data["close_at"] = self.close_at
+        if self.draw_at is not None:
+            data["draw_at"] = self.draw_at
+        if self.channel_id is not None:
+            data["channel"] = self.channel_id
+        return data
+
+
+class PrizeStore:
+    """獎品名稱 -> Prize 的容器，取代原本的 dict-of-lists。
+
+    每個獎品另有一個不重複使用的整數 ID：next_id 只增不減並隨資料保存，
+    已抽出的獎品 ID 不會被新獎品沿用，舊訊息上的按鈕也就不會指到別的獎品。
+    """
+
+    __slots__ = ('_prizes', '_by_id', 'next_id')
+
+    def __init__(self):
+        self._prizes = {}
+        self._by_id = {}
+        self.next_id = 1
+
+    def _insert(self, prize, prize_id=None):
+        # 沿用資料中的 ID（重複或無效時改發新 ID）
+        if prize_id is None or prize_id in self._by_id:
+            prize_id = self.next_id
+        prize.id = prize_id
+        self.next_id = max(self.next_id, prize_id + 1)
+        self._prizes[prize.name] = prize
+        self._by_id[prize_id] = prize
+        return prize
+
+    @classmethod
+    def from_dict(cls, data):
+        # 嚴格驗證資料格式，略過結構無效的項目
+        store = cls()
+        for name, info in data.items():
+            if (isinstance(name, str) and
+                    isinstance(info, dict) and
+                    isinstance(info.get("participants"), list) and
+                    isinstance(info.get("winners"), int)):
+                prize = store._insert(Prize(name, info["winners"], info["participants"]), read_prize_id(info))
+                prize.schedule = read_schedule(info)
+        store.reserve(data.get(NEXT_ID_KEY))
+        return store
+
+    @classmethod
+    def from_rows(cls, rows, next_id=None):
+        """由 (名稱, 得獎人數, ID array, 舊名稱, 排程, 獎品 ID) 建立，供二進位快照載入使用。"""
+        store = cls()
+        for name, winners, ids, legacy, schedule, prize_id in rows:
+            prize = store._insert(Prize(name, winners), prize_id)
+            prize.participants = ParticipantSet.from_array(ids, legacy)
+            prize.schedule = schedule
+        store.reserve(next_id)
+        return store
+
+    def reserve(self, next_id):
+        # 下一個 ID 至少從 next_id 開始（例如已抽出的獎品用過的 ID）
+        if isinstance(next_id, int) and not isinstance(next_id, bool):
+            self.next_id = max(self.next_id, next_id)
+
+    def to_dict(self):
+        data = {name: prize.to_dict() for name, prize in self._prizes.items()}
+        data[NEXT_ID_KEY] = self.next_id
+        return data
+
+    def rows(self):
+        """回傳 [(名稱, 得獎人數, ID array 副本, 舊名稱副本, 排程, 獎品 ID)]，在事件迴圈上複製後交給執行緒寫入快照。"""
+        return [
+            (name, prize.winners, prize.participants.id_array(), list(prize.participants.legacy), prize.schedule,
+             prize.id)
+            for name, prize in self._prizes.items()
+        ]
+
+    def add(self, name, winners=1, schedule=None, prize_id=None):
+        if name in self._prizes:
+            return None
+        prize = self._insert(Prize(name, winners), prize_id)
+        if schedule is not None:
+            prize.schedule = schedule
+        return prize
+
+    def pop(self, name, default=None):
+        prize = self._prizes.pop(name, None)
+        if prize is None:
+            return default
+        self._by_id.pop(prize.id, None)
+        return prize
+
+    def by_id(self, prize_id):
+        return self._by_id.get(prize_id)
+
+    def join(self, name, user_id):
+        prize = self._prizes.get(name)
+        return prize is not None and not prize.closed and prize.participants.add(user_id)
+
+    def leave(self, name, user_id):
+        prize = self._prizes.get(name)
+        return prize is not None and not prize.closed and prize.participants.discard(user_id)
+
+    def is_closed(self, name, now=None):
+        # 正在抽獎，或已過報名截止時間
+        prize = self._prizes.get(name)
+        if prize is None:
+            return False
+        if prize.closed:
+            return True
+        return prize.close_at is not None and (now if now is not None else time.time()) >= prize.close_at
+
+    def freeze(self, names=None):
+        """凍結獎品名單供抽獎讀取（每項 O(1)，不複製名單），回傳被凍結的名稱。"""
+        if names is None:
+            names = self.names()
+        frozen = []
+        for name in names:
+            prize = self._prizes.get(name)
+            if prize is not None and not prize.closed:
+                prize.closed = True
+                frozen.append(name)
+        return frozen
+
+    def thaw(self, names):
+        for name in names:
+            prize = self._prizes.get(name)
+            if prize is not None:
+                prize.closed = False
+
+    def commit_draw(self, names):
+        # 抽獎完成：一次移除所有凍結的獎品
+        for name in names:
+            self.pop(name)
+
+    def get(self, name, default=None):
+        return self._prizes.get(name, default)
+
+    def __getitem__(self, name):
+        return self._prizes[name]
+
+    def __contains__(self, name):
+        return name in self._prizes
+
+    def __len__(self):
+        return len(self._prizes)
+
+    def __iter__(self):
+        return iter(self._prizes)
+
+    def names(self):
+        return list(self._prizes)
+
+    def migrate_legacy(self, lookup):
+        """一次遷移所有獎品的舊資料名稱，回傳 (已遷移筆數, {獎品: [無法解析的名稱]})。"""
+        migrated = 0
+        unresolved = {}
+        for name, prize in self._prizes.items():
+            legacy = prize.participants.legacy
+            if not legacy:
+                continue
+            before = len(legacy)
+            remaining = prize.participants.resolve_legacy(lookup)
+            migrated += before - len(remaining)
+            if remaining:
+                unresolved[name] = remaining
+        return migrated, unresolved
+
+    def items(self):
+        return self._prizes.items()
+
+    def values(self):
+        return self._prizes.values()
@@ -0,0 +1,254 @@
+import array
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+
+import aiohttp
+
+import snapshot
+from backup import BACKUP_FORMAT, rebuild
+from prize_store import NEXT_ID_KEY, ParticipantSet, PrizeStore, read_prize_id, read_schedule
+
+MODES = ('replace', 'merge', 'dry-run')
+EXTENSIONS = ('.json', '.json.gz', '.gz', snapshot.EXTENSION)
+CHUNK_SIZE = 1 << 20
+
+_WS = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9eE.+-]*')
+
+
+class JsonStream:
+    """逐段讀取 JSON 文字，一次只解碼一個值；記憶體中只保留目前正在解碼的值。"""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _more(self, at_least=0):
+        # 丟掉已解碼的部分再讀入下一段
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.fp.read(max(self.chunk_size, at_least))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _peek(self):
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return None
+
+    def _expect(self, chars):
+        ch = self._peek()
+        if ch is None or ch not in chars:
+            raise ValueError(f"JSON 格式錯誤：預期 {' 或 '.join(chars)}，但讀到 {ch or '檔案結尾'}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        if self._peek() is None:
+            raise ValueError("JSON 檔案不完整")
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 值還沒讀完：至少再讀入與目前未解碼部分一樣多的資料，避免大型值被反覆重新解碼
+                if self._more(len(self.buf) - self.pos):
+                    continue
+                raise ValueError("JSON 檔案不完整或格式錯誤") from None
+            # 數字可能被切在段落邊界（包括切在小數點或指數中間）：其後還沒有分隔字元時再讀一段
+            if (isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(self.buf, end)
+                    and self._more()):
+                continue
+            self.pos = end
+            return value
+
+    def members(self):
+        """逐一產生物件的鍵；呼叫端要在下一次迭代前以 value() 或 members() 讀完對應的值。"""
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("JSON 格式錯誤：物件的鍵必須是字串")
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def finish(self):
+        if self._peek() is not None:
+            raise ValueError("JSON 結尾有多餘的內容")
+
+
+def _stage_prize(store, name, info):
+    if name == NEXT_ID_KEY:
+        store.reserve(info)
+        return
+    if not (isinstance(info, dict) and
+            isinstance(info.get("participants"), list) and
+            isinstance(info.get("winners"), int)):
+        raise ValueError(f"獎品 {name} 的結構無效")
+    store.pop(name)  # 重複的鍵以最後一個為準，與 json.load 相同
+    prize = store.add(name, info["winners"], read_schedule(info), read_prize_id(info))
+    prize.participants = ParticipantSet(info["participants"])
+
+
+def _stage_prizes(stream):
+    store = PrizeStore()
+    for name in stream.members():
+        _stage_prize(store, name, stream.value())
+    return store
+
+
+def open_text(path):
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    raw = gzip.open(path, 'rb') if compressed else open(path, 'rb')
+    return io.TextIOWrapper(raw, encoding='utf-8-sig')
+
+
+def read_file(path):
+    """在執行緒中解析一個還原檔，回傳 PrizeStore（舊版 prizes_data.json、二進位快照）或自動備份 payload。
+
+    自動備份的 data 直接串流進暫存的 PrizeStore；其他欄位都很小，整個解碼。
+    """
+    if snapshot.is_binary(path):
+        return snapshot.load(path)
+    with open_text(path) as fp:
+        stream = JsonStream(fp)
+        keys = stream.members()
+        first = next(keys, None)
+        if first == "format":
+            value = stream.value()
+            if value == BACKUP_FORMAT:
+                payload = {"format": value}
+                for key in keys:
+                    payload[key] = _stage_prizes(stream) if key == "data" else stream.value()
+                stream.finish()
+                return payload
+        elif first is not None:
+            value = stream.value()
+        store = PrizeStore()
+        if first is not None:
+            _stage_prize(store, first, value)
+            for name in keys:
+                _stage_prize(store, name, stream.value())
+        stream.finish()
+        return store
+
+
+def stage(paths):
+    """解析所有附件並組出還原後的 PrizeStore，回傳 (store, 說明)。任何錯誤都會在替換前拋出。"""
+    results = [read_file(path) for path in paths]
+    payloads = [r for r in results if isinstance(r, dict)]
+    if payloads:
+        # 自動備份格式：一份完整快照加上任意數量的增量
+        store, version, applied = rebuild(payloads)
+        return store, f"版本 v{version}，套用 {applied} 份增量"
+    return results[0], None
+
+
+async def download(attachment, directory=None, chunk_size=CHUNK_SIZE):
+    """以串流方式把附件下載到暫存檔並回傳路徑，不把整個檔案讀進記憶體。"""
+    fd, path = tempfile.mkstemp(prefix='restore_', suffix=os.path.basename(attachment.filename), dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(attachment.url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+class RestoreDiff:
+    """還原前後的差異：新增 / 移除 / 得獎人數變更的獎品，以及加入 / 移除的參加者數。"""
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.joined = 0
+        self.left = 0
+
+    def summary(self, limit=10):
+        lines = [
+            f"獎品：新增 {len(self.added)}、移除 {len(self.removed)}、得獎人數變更 {len(self.changed)}",
+            f"參加者：加入 {self.joined}、移除 {self.left}",
+        ]
+        for label, names in (("新增", self.added), ("移除", self.removed), ("變更", self.changed)):
+            if names:
+                more = f" 等 {len(names)} 個" if len(names) > limit else ""
+                lines.append(f"{label}：{', '.join(names[:limit])}{more}")
+        return "\n".join(lines)
+
+
+def diff(current_rows, store):
+    result = RestoreDiff()
+    current = {name: (winners, ids, legacy) for name, winners, ids, legacy, *_ in current_rows}
+    for name, prize in store.items():
+        if name not in current:
+            result.added.append(name)
+            result.joined += len(prize.participants)
+            continue
+        winners, ids, legacy = current[name]
+        if winners != prize.winners:
+            result.changed.append(name)
+        before = set(ids)
+        before.update(legacy)
+        after = set(prize.participants)
+        result.joined += len(after - before)
+        result.left += len(before - after)
+    for name, (winners, ids, legacy) in current.items():
+        if name not in store:
+            result.removed.append(name)
+            result.left += len(ids) + len(legacy)
+    return result
+
+
+def merge(current_rows, staged, next_id=None):
+    # 保留目前所有獎品、得獎人數與獎品 ID，參加者取聯集；還原檔中才有的獎品整個加入並取得新 ID
+    # from_rows 直接採用傳入的 ID 陣列；複製一份，聯集才不會改到 diff() 要比對的原始名單
+    store = PrizeStore.from_rows(
+        ((name, winners, array.array('q', ids), *rest) for name, winners, ids, *rest in current_rows), next_id
+    )
+    for name, prize in staged.items():
+        existing = store.get(name)
+        if existing is None:
+            store.add(name, prize.winners, prize.schedule).participants = prize.participants
+            continue
+        for member in prize.participants:
+            existing.participants.add(member)
+    return store
+
+
+def plan(current_rows, staged, mode, next_id=None):
+    """回傳 (要換上的 PrizeStore, RestoreDiff)；dry-run 與 replace 換上的都是還原檔本身。
+
+    next_id 為目前的下一個獎品 ID：還原後的新獎品不會沿用目前資料中已用過的 ID。
+    """
+    if mode == 'merge':
+        store = merge(current_rows, staged, next_id)
+    else:
+        store = staged
+        store.reserve(next_id)
+    return store, diff(current_rows, store)
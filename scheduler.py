@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+import re
+import time
+
+from instrumentation import metrics
+
+CLOSE = 'close'
+DRAW = 'draw'
+
+_RELATIVE = re.compile(r'^(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?$')
+
+
+def parse_when(text, tz, now=None):
+    """把 30m、1h30m、2d 等相對時間，或 HH:MM、YYYY-MM-DD HH:MM（tz 時區）轉成 epoch 秒。"""
+    text = text.strip()
+    now = time.time() if now is None else now
+    match = _RELATIVE.match(text)
+    if match and any(match.groups()):
+        days, hours, minutes, seconds = (int(g or 0) for g in match.groups())
+        return now + datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds).total_seconds()
+    local_now = datetime.datetime.fromtimestamp(now, tz)
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%H:%M'):
+        try:
+            parsed = datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if fmt == '%H:%M':
+            # 只給時間：今天的這個時間，已過則為明天
+            parsed = local_now.replace(hour=parsed.hour, minute=parsed.minute, second=0, microsecond=0, tzinfo=None)
+            if tz.localize(parsed).timestamp() <= now:
+                parsed += datetime.timedelta(days=1)
+        return tz.localize(parsed).timestamp()
+    raise ValueError(f"無法解析時間「{text}」，請使用 30m、2h、HH:MM 或 YYYY-MM-DD HH:MM")
+
+
+class PrizeScheduler:
+    """以單一背景工作與最小堆積，在設定的時間公告報名截止、自動抽獎。
+
+    堆積不另外保存：排程時間存在獎品資料中，載入或還原分區時以 track() 重建。
+    到期時才檢查獎品是否仍存在、時間是否仍相同，過期的項目直接丟棄；
+    最早的事件到期 batch_window 秒後，所有已到期的事件依（分區、頻道）合併成一次抽獎與一則結果訊息。
+    """
+
+    def __init__(self, on_close, on_draw, batch_window=1.0):
+        self.on_close = on_close    # async on_close(partition, channel_id, [獎品名稱])
+        self.on_draw = on_draw      # async on_draw(partition, channel_id, [獎品名稱])
+        self.batch_window = batch_window
+        self._heap = []             # (時間, 序號, 種類, 分區, 獎品名稱)
+        self._queued = set()        # 避免重複排入同一事件
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def schedule(self, partition, prize):
+        for kind, when in ((CLOSE, prize.close_at), (DRAW, prize.draw_at)):
+            if when is None:
+                continue
+            key = (kind, partition.label, prize.name, when)
+            if key in self._queued:
+                continue
+            self._queued.add(key)
+            heapq.heappush(self._heap, (when, next(self._seq), kind, partition, prize.name))
+            if self._heap[0][0] == when:
+                self._wake.set()  # 新事件比目前等待的更早
+
+    def track(self, partition):
+        for prize in partition.store.values():
+            self.schedule(partition, prize)
+
+    @staticmethod
+    def _still_due(kind, partition, name, when):
+        prize = partition.store.get(name)
+        if prize is None:
+            return None
+        return prize if (prize.close_at if kind == CLOSE else prize.draw_at) == when else None
+
+    def _pop_due(self):
+        cutoff = time.time()
+        closes = {}
+        draws = {}
+        while self._heap and self._heap[0][0] <= cutoff:
+            when, _, kind, partition, name = heapq.heappop(self._heap)
+            self._queued.discard((kind, partition.label, name, when))
+            prize = self._still_due(kind, partition, name, when)
+            if prize is None:
+                continue
+            batch = (closes if kind == CLOSE else draws).setdefault((partition, prize.channel_id), [])
+            if name not in batch:
+                batch.append(name)
+        # 同一批同時截止又抽獎的獎品只公告抽獎結果
+        for key, names in draws.items():
+            if key in closes:
+                closes[key] = [n for n in closes[key] if n not in names]
+        return closes, draws
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            # 最早的事件到期後再等 batch_window 秒，讓同一時間到期的事件一起處理；不會提早觸發
+            delay = self._heap[0][0] + self.batch_window - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            closes, draws = self._pop_due()
+            for kind, batches, handler in ((CLOSE, closes, self.on_close), (DRAW, draws, self.on_draw)):
+                for (partition, channel_id), names in batches.items():
+                    if not names:
+                        continue
+                    try:
+                        with metrics.timer(f"scheduler.{kind}"):
+                            await handler(partition, channel_id, names)
+                    except Exception as e:
+                        logging.error("排程%s失敗 [%s]: %s", "截止" if kind == CLOSE else "抽獎", partition.label, e)
@@ -0,0 +1,133 @@
+"""獎品快照的二進位格式：參加者 ID 以原始 int64 陣列保存，載入時不需逐一解析字串。
+
+    檔頭      MAGIC(8) 版本(u16) 獎品數(u32) 下一個獎品 ID(u32)（版本 3 起）
+    每個獎品  名稱長度(u16) 得獎人數(i64) ID 數(u32) 舊名稱數(u32)
+              截止時間(f64) 抽獎時間(f64) 公告頻道(u64)（版本 2 起；未設定為 NaN / 0）
+              獎品 ID(u32)（版本 3 起） 名稱(UTF-8)
+              ID × N（小端序 int64）  舊名稱 × M（長度(u16) + UTF-8）
+    檔尾      CRC32(u32)，涵蓋檔尾之前的所有內容
+"""
+
+import array
+import math
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from prize_store import PrizeStore
+
+MAGIC = b'DRAWSNAP'
+VERSION = 3
+EXTENSION = '.snap'
+
+_HEADER = struct.Struct('<8sHI')
+_NEXT_ID = struct.Struct('<I')
+_PRIZES = {1: struct.Struct('<HqII'), 2: struct.Struct('<HqIIddQ'), 3: struct.Struct('<HqIIddQI')}
+_NONE = float('nan')
+_STR = struct.Struct('<H')
+_CRC = struct.Struct('<I')
+_SWAP = sys.byteorder != 'little'
+
+
+def is_binary(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def dump(rows, next_id, f):
+    """把 PrizeStore.rows() 與 next_id 寫入 f，邊寫邊計算 CRC，不在記憶體中組出整份檔案。"""
+    crc = 0
+
+    def put(chunk):
+        nonlocal crc
+        crc = zlib.crc32(chunk, crc)
+        f.write(chunk)
+
+    put(_HEADER.pack(MAGIC, VERSION, len(rows)))
+    put(_NEXT_ID.pack(next_id))
+    prize_struct = _PRIZES[VERSION]
+    for name, winners, ids, legacy, (close_at, draw_at, channel_id), prize_id in rows:
+        encoded = name.encode('utf-8')
+        legacy = [n.encode('utf-8') for n in legacy]
+        put(prize_struct.pack(
+            len(encoded), winners, len(ids), len(legacy),
+            _NONE if close_at is None else close_at, _NONE if draw_at is None else draw_at, channel_id or 0,
+            prize_id
+        ))
+        put(encoded)
+        if _SWAP:
+            ids = array.array('q', ids)
+            ids.byteswap()
+        put(memoryview(ids).cast('B'))
+        for item in legacy:
+            put(_STR.pack(len(item)))
+            put(item)
+    f.write(_CRC.pack(crc))
+
+
+def load(path):
+    """以 mmap 讀取快照，先核對 CRC，再一次走完所有獎品並檢查邊界，回傳 PrizeStore。"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size + _CRC.size:
+            raise ValueError(f"{path} 不是完整的快照檔")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                try:
+                    return _read(view)
+                except struct.error as e:
+                    raise ValueError(f"{path} 快照檔結構損毀：{e}") from None
+
+
+def _read(view):
+    end = len(view) - _CRC.size
+    (crc,) = _CRC.unpack_from(view, end)
+    if zlib.crc32(view[:end]) != crc:
+        raise ValueError("快照檔 CRC 不符，檔案可能損毀")
+    magic, version, count = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version not in _PRIZES:
+        raise ValueError(f"不支援的快照格式（版本 {version}）")
+    pos = _HEADER.size
+    next_id = None
+    if version >= 3:
+        (next_id,) = _NEXT_ID.unpack_from(view, pos)
+        pos += _NEXT_ID.size
+    return PrizeStore.from_rows(_parse(view, version, count, pos, end), next_id)
+
+
+def _parse(view, version, count, pos, end):
+    prize_struct = _PRIZES[version]
+    for _ in range(count):
+        name_len, winners, id_count, legacy_count, *extra = prize_struct.unpack_from(view, pos)
+        pos += prize_struct.size
+        schedule = _schedule(*extra[:3]) if extra else (None, None, None)
+        # 版本 3 之前沒有獎品 ID，載入時依序指派
+        prize_id = (extra[3] or None) if len(extra) > 3 else None
+        name = str(view[pos:pos + name_len], 'utf-8')
+        pos += name_len
+        size = id_count * 8
+        if pos + size > end:
+            raise ValueError(f"獎品 {name} 的參加者資料超出檔案範圍")
+        ids = array.array('q')
+        ids.frombytes(view[pos:pos + size])
+        if _SWAP:
+            ids.byteswap()
+        pos += size
+        legacy = []
+        for _ in range(legacy_count):
+            (length,) = _STR.unpack_from(view, pos)
+            pos += _STR.size
+            legacy.append(str(view[pos:pos + length], 'utf-8'))
+            pos += length
+        if pos > end:
+            raise ValueError(f"獎品 {name} 的資料超出檔案範圍")
+        yield name, winners, ids, legacy, schedule, prize_id
+    if pos != end:
+        raise ValueError("快照檔結尾有多餘的資料")
+
+
+def _schedule(close_at, draw_at, channel_id):
+    return (None if math.isnan(close_at) else close_at,
+            None if math.isnan(draw_at) else draw_at,
+            channel_id or None)
@@ -0,0 +1,396 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import snapshot
+from prize_store import NEXT_ID_KEY, ParticipantSet, PrizeStore, read_prize_id, read_schedule
+
+SNAPSHOT_PATH = 'prizes_data.json'
+JOURNAL_PATH = 'prizes_journal.jsonl'
+SQLITE_PATH = 'prizes_data.db'
+
+
+def apply_record(store, record):
+    # 所有操作都是冪等的：壓縮途中崩潰導致重播已寫入快照的紀錄也不會出錯
+    op = record.get("op")
+    name = record.get("prize")
+    if op == "join":
+        store.join(name, record["user"])
+    elif op == "leave":
+        store.leave(name, record["user"])
+    elif op == "add":
+        store.add(name, record.get("winners", 1), read_schedule(record), read_prize_id(record))
+    elif op == "draw":
+        store.pop(name)
+
+
+def snapshot_bytes(data):
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def atomic_write(path, write):
+    # 先寫暫存檔、fsync 後再改名，避免寫到一半崩潰截斷快照
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return  # 部分平台（如 Windows）無法開啟目錄
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def write_snapshot(data, path=SNAPSHOT_PATH):
+    atomic_write(path, lambda f: f.write(snapshot_bytes(data)))
+
+
+def binary_path(path):
+    # prizes_data.json -> prizes_data.snap
+    return os.path.splitext(path)[0] + snapshot.EXTENSION
+
+
+def newest_snapshot(path=SNAPSHOT_PATH):
+    # JSON 與二進位快照並存時（例如切換 SNAPSHOT_FORMAT 後）以較新的一份為準
+    candidates = [p for p in (binary_path(path), path) if os.path.exists(p)]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def load_snapshot_file(path):
+    # 依檔頭判斷格式，不看副檔名
+    if snapshot.is_binary(path):
+        return snapshot.load(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return PrizeStore.from_dict(json.load(f))
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    found = newest_snapshot(path)
+    return None if found is None else load_snapshot_file(found)
+
+
+class SnapshotFile:
+    """完整快照檔：依 SNAPSHOT_FORMAT 寫入二進位或 JSON，讀取時兩種格式都接受。"""
+
+    def __init__(self, path=SNAPSHOT_PATH, fmt='binary'):
+        self.path = binary_path(path) if fmt == 'binary' else path
+        self.json_path = path
+        self.format = fmt
+        self.stale = False  # 讀到的檔案不是設定的格式，上線後需要改寫一次
+
+    def read(self):
+        found = newest_snapshot(self.json_path)
+        if found is None:
+            return None
+        self.stale = found != self.path
+        return load_snapshot_file(found)
+
+    def capture(self, store):
+        # 在事件迴圈上複製資料；二進位格式直接複製 ID 陣列，不必逐一轉成字串
+        return (store.rows(), store.next_id) if self.format == 'binary' else store.to_dict()
+
+    def write(self, data):
+        if self.format == 'binary':
+            atomic_write(self.path, lambda f: snapshot.dump(*data, f))
+        else:
+            write_snapshot(data, self.path)
+        self.stale = False
+
+
+class JsonStorage:
+    """每次保存都重寫整個快照檔（舊行為）。"""
+
+    def __init__(self, path=SNAPSHOT_PATH, fmt='binary'):
+        self.snapshot_file = SnapshotFile(path, fmt)
+        self.pending_records = 0
+
+    @property
+    def stale(self):
+        return self.snapshot_file.stale
+
+    def load(self):
+        return self.snapshot_file.read()
+
+    def capture(self, store):
+        return self.snapshot_file.capture(store)
+
+    def wants_snapshot(self, records):
+        return True
+
+    def save(self, records, snapshot=None):
+        self.snapshot_file.write(snapshot)
+
+
+class JournalStorage:
+    """預寫日誌：每次變更只附加一行紀錄，定期壓縮回快照。"""
+
+    def __init__(self, path=SNAPSHOT_PATH, journal_path=JOURNAL_PATH, compact_records=5000, fmt='binary'):
+        self.snapshot_file = SnapshotFile(path, fmt)
+        self.journal_path = journal_path
+        self.compact_records = compact_records
+        self.pending_records = 0  # 自上次壓縮後累積的紀錄數
+
+    @property
+    def stale(self):
+        return self.snapshot_file.stale
+
+    def load(self):
+        store = self.snapshot_file.read()
+        if not os.path.exists(self.journal_path):
+            return store
+        if store is None:
+            store = PrizeStore()
+        replayed = 0
+        good = 0  # 最後一筆完整紀錄結尾的位元組位置
+        torn = False
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # 沒有換行的最後一行是寫到一半的紀錄
+                    torn = bool(line.strip())
+                    break
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 崩潰造成的損毀紀錄，之後的內容無法信任
+                        torn = True
+                        break
+                    apply_record(store, record)
+                    replayed += 1
+                good += len(line)
+        if torn:
+            # 截掉損毀的部分，否則下一筆紀錄會接在殘缺的行後面，之後每次重播都在同一處停止
+            logging.warning("日誌第 %s 筆紀錄損毀，已截斷並停止重播", replayed + 1)
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good)
+                f.flush()
+                os.fsync(f.fileno())
+        self.pending_records = replayed
+        logging.debug("已重播 %s 筆日誌紀錄", replayed)
+        return store
+
+    def capture(self, store):
+        return self.snapshot_file.capture(store)
+
+    def wants_snapshot(self, records):
+        # 沒有具體變更紀錄時（例如上線、斷線）或日誌過長時做一次壓縮
+        return not records or self.pending_records + len(records) >= self.compact_records
+
+    def save(self, records, snapshot=None):
+        if snapshot is not None:
+            # 快照已包含 records 的效果，落地後日誌可以清空
+            self.snapshot_file.write(snapshot)
+            with open(self.journal_path, 'w', encoding='utf-8'):
+                pass
+            self.pending_records = 0
+            return
+        lines = "".join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) + "\n" for r in records)
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending_records += len(records)
+
+
+class SqliteStorage:
+    """SQLite（WAL 模式）：每次加入 / 退出只寫入或刪除一列，查詢只讀取需要的列。"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS prizes (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            winners INTEGER NOT NULL DEFAULT 1,
+            close_at REAL,
+            draw_at REAL,
+            channel_id INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS participants (
+            seq INTEGER PRIMARY KEY,
+            prize_id INTEGER NOT NULL REFERENCES prizes(id) ON DELETE CASCADE,
+            user_id NOT NULL,
+            UNIQUE (prize_id, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS participants_user ON participants(user_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value
+        );
+    """
+
+    def __init__(self, path=SQLITE_PATH, import_path=SNAPSHOT_PATH):
+        self.path = path
+        self.import_path = import_path
+        self.pending_records = 0
+        self.stale = False
+        # 連線會在 asyncio.to_thread 的不同執行緒中使用，以鎖序列化
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+        # 舊版資料庫沒有排程欄位
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(prizes)")}
+        for column, kind in (("close_at", "REAL"), ("draw_at", "REAL"), ("channel_id", "INTEGER")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE prizes ADD COLUMN {column} {kind}")
+
+    def load(self):
+        with self._lock:
+            empty = self._conn.execute("SELECT 1 FROM prizes LIMIT 1").fetchone() is None
+        if empty:
+            # 第一次啟用 SQLite 時從舊的 prizes_data.json 匯入
+            store = read_snapshot(self.import_path)
+            if store is None:
+                return None
+            self.import_store(store)
+            print(f"ℹ️ 已從 {self.import_path} 匯入 {len(store)} 個獎品到 {self.path}")
+            return store
+        store = PrizeStore()
+        with self._lock:
+            names = {}
+            # prizes.id 就是獎品 ID
+            for prize_id, name, winners, *schedule in self._conn.execute(
+                    "SELECT id, name, winners, close_at, draw_at, channel_id FROM prizes ORDER BY id"):
+                store.add(name, winners, tuple(schedule), prize_id)
+                names[prize_id] = name
+            for prize_id, user_id in self._conn.execute("SELECT prize_id, user_id FROM participants ORDER BY seq"):
+                store.join(names[prize_id], user_id)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        if row is not None:
+            store.reserve(row[0])
+        return store
+
+    def import_store(self, store):
+        self.save((), store.to_dict())
+
+    def capture(self, store):
+        return store.to_dict()
+
+    def wants_snapshot(self, records):
+        # 只有上線、還原等沒有具體紀錄的保存才需要整份覆寫
+        return not records
+
+    def save(self, records, snapshot=None):
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if snapshot is not None:
+                    conn.execute("DELETE FROM prizes")
+                    for name, info in snapshot.items():
+                        if name == NEXT_ID_KEY:
+                            self._reserve(conn, info)
+                            continue
+                        cur = conn.execute(
+                            "INSERT INTO prizes (id, name, winners, close_at, draw_at, channel_id) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (read_prize_id(info), name, info["winners"], *read_schedule(info))
+                        )
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO participants (prize_id, user_id) VALUES (?, ?)",
+                            ((cur.lastrowid, self._user_key(p)) for p in info["participants"])
+                        )
+                else:
+                    for record in records:
+                        self._apply(conn, record)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _user_key(member):
+        # 雪花 ID 以整數保存，舊資料的名稱保持字串（判斷方式與 ParticipantSet 相同）
+        user_id = ParticipantSet._coerce(member)
+        return str(member) if user_id is None else user_id
+
+    @staticmethod
+    def _reserve(conn, next_id):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('next_id', ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = max(value, excluded.value)",
+            (next_id,)
+        )
+
+    def _apply(self, conn, record):
+        op = record.get("op")
+        name = record.get("prize")
+        if op == "join":
+            conn.execute(
+                "INSERT OR IGNORE INTO participants (prize_id, user_id) SELECT id, ? FROM prizes WHERE name = ?",
+                (self._user_key(record["user"]), name)
+            )
+        elif op == "leave":
+            conn.execute(
+                "DELETE FROM participants WHERE user_id = ? AND prize_id = (SELECT id FROM prizes WHERE name = ?)",
+                (self._user_key(record["user"]), name)
+            )
+        elif op == "add":
+            prize_id = read_prize_id(record)
+            conn.execute(
+                "INSERT OR IGNORE INTO prizes (id, name, winners, close_at, draw_at, channel_id) VALUES (?, ?, ?, ?, ?, ?)",
+                (prize_id, name, record.get("winners", 1), *read_schedule(record))
+            )
+            if prize_id is not None:
+                self._reserve(conn, prize_id + 1)
+        elif op == "draw":
+            conn.execute("DELETE FROM prizes WHERE name = ?", (name,))
+
+    def fetch_prizes(self, names=None):
+        """回傳 [(名稱, 得獎人數, [參加者...])]；names 為 None 時回傳全部獎品。"""
+        with self._lock:
+            if names is None:
+                prizes = self._conn.execute("SELECT id, name, winners FROM prizes ORDER BY id").fetchall()
+            else:
+                marks = ",".join("?" * len(names))
+                found = {
+                    name: (prize_id, name, winners)
+                    for prize_id, name, winners in self._conn.execute(
+                        f"SELECT id, name, winners FROM prizes WHERE name IN ({marks})", list(names))
+                }
+                prizes = [found[n] for n in names if n in found]
+            rows = []
+            for prize_id, name, winners in prizes:
+                participants = [
+                    user_id for (user_id,) in self._conn.execute(
+                        "SELECT user_id FROM participants WHERE prize_id = ? ORDER BY seq", (prize_id,))
+                ]
+                rows.append((name, winners, participants))
+        return rows
+
+
+def partition_path(path, partition):
+    # prizes_data.json -> prizes_data_<partition>.json；partition 為 None 時維持舊路徑
+    if partition is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{partition}{ext}"
+
+
+def create_storage(mode, partition=None):
+    # binary：精簡的二進位快照（預設，啟動較快）；json：可直接閱讀的 prizes_data.json
+    fmt = os.getenv('SNAPSHOT_FORMAT', 'binary')
+    if mode == 'journal':
+        return JournalStorage(
+            partition_path(SNAPSHOT_PATH, partition), partition_path(JOURNAL_PATH, partition),
+            compact_records=int(os.getenv('JOURNAL_COMPACT_RECORDS', '5000')), fmt=fmt
+        )
+    if mode == 'sqlite':
+        return SqliteStorage(
+            partition_path(os.getenv('SQLITE_PATH', SQLITE_PATH), partition),
+            import_path=partition_path(SNAPSHOT_PATH, partition)
+        )
+    return JsonStorage(partition_path(SNAPSHOT_PATH, partition), fmt)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模組都放在專案根目錄，讓直接執行 pytest 時也能匯入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from draw_engine import draw_all, draw_unique
+
+
+def max_assignment(rows):
+    # 對照用：把每個名額展開成一個節點，以 Kuhn 演算法求最大匹配
+    slots = [participants for _, winners, participants in rows for _ in range(winners)]
+    match = {}
+
+    def try_slot(s, seen):
+        for member in slots[s]:
+            if member in seen:
+                continue
+            seen.add(member)
+            if member not in match or try_slot(match[member], seen):
+                match[member] = s
+                return True
+        return False
+
+    return sum(try_slot(s, set()) for s in range(len(slots)))
+
+
+def check(rows, result):
+    winners = [w for p in result.prizes for w in p.winners]
+    assert len(winners) == len(set(winners))
+    for (name, count, participants), prize in zip(rows, result.prizes):
+        assert prize.name == name
+        assert len(prize.winners) <= count
+        assert set(prize.winners) <= set(participants)
+    return len(winners)
+
+
+def test_fills_through_two_hops():
+    rows = [("p0", 1, [1, 3]), ("p1", 1, [1, 2]), ("p2", 1, [2])]
+    result = draw_unique(rows, seed=106)
+    assert check(rows, result) == 3
+    assert result.unfilled == []
+
+
+@pytest.mark.parametrize("case", range(300))
+def test_matches_maximum_assignment(case):
+    rng = random.Random(case)
+    users = list(range(1, rng.randint(2, 9)))
+    rows = [
+        (f"p{i}", rng.randint(1, 3), rng.sample(users, rng.randint(0, len(users))))
+        for i in range(rng.randint(1, 5))
+    ]
+    for seed in range(3):
+        assert check(rows, draw_unique(rows, seed)) == max_assignment(rows)
+
+
+def test_same_seed_same_result():
+    rows = [(f"p{i}", 2, list(range(i, i + 30))) for i in range(10)]
+    first = [p.winners for p in draw_unique(rows, 42).prizes]
+    assert [p.winners for p in draw_unique(rows, 42).prizes] == first
+    assert [p.winners for p in draw_all(rows, 42).prizes] == [p.winners for p in draw_all(rows, 42).prizes]
@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+
+from restore import JsonStream
+
+DOCUMENT = {
+    "format": "draw_bot.backup",
+    "numbers": [0, -1, 12345678901234567890, 3.25, -1.5e-7, 1e+300],
+    "獎品": {"participants": ["123456789012345678", "舊名稱"], "winners": 12},
+    "empty": {},
+    "nested": {"a": [], "b": [{"c": None}, True, False], "escaped": "\"\\\né"},
+    "last": 98765,
+}
+
+
+def read_members(stream):
+    return {key: stream.value() for key in stream.members()}
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+def test_matches_json_loads(chunk_size, indent):
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=indent)
+    stream = JsonStream(io.StringIO(text), chunk_size=chunk_size)
+    assert read_members(stream) == json.loads(text)
+    stream.finish()
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+def test_numbers_split_at_chunk_boundary(chunk_size):
+    # 數字剛好在段落結尾時不能只讀到前半段
+    for text in ('{"n": 1234567}', '{"n":-98.765e+12}', '{"a": 10, "b": 2000000}', '{"n": 42}'):
+        stream = JsonStream(io.StringIO(text), chunk_size=chunk_size)
+        assert read_members(stream) == json.loads(text)
+        stream.finish()
+
+
+def test_top_level_number_at_eof():
+    stream = JsonStream(io.StringIO("123456"), chunk_size=3)
+    assert stream.value() == 123456
+    stream.finish()
+
+
+def test_empty_object():
+    stream = JsonStream(io.StringIO(" { } "), chunk_size=1)
+    assert read_members(stream) == {}
+    stream.finish()
+
+
+@pytest.mark.parametrize("text", ['{"a": 1', '{"a": [1, 2', '{"a" 1}', '{"a": 1,}', '{1: 2}', ''])
+def test_malformed(text):
+    stream = JsonStream(io.StringIO(text), chunk_size=2)
+    with pytest.raises(ValueError):
+        read_members(stream)
+        stream.finish()
+
+
+def test_trailing_content():
+    stream = JsonStream(io.StringIO('{"a": 1} x'), chunk_size=4)
+    assert read_members(stream) == {"a": 1}
+    with pytest.raises(ValueError):
+        stream.finish()
@@ -0,0 +1,58 @@
+import asyncio
+import importlib
+
+import pytest
+
+from benchmarks.fakes import FakeGuild
+from embed_pager import MAX_FIELD_NAME, MAX_FIELD_VALUE, MAX_TOTAL
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    # draw_bot 在匯入時讀取環境變數並在目前目錄建立資料檔
+    monkeypatch.setenv('TOKEN', 'test')
+    monkeypatch.setenv('BACKUP_USER_ID', '0')
+    monkeypatch.setenv('STORAGE_MODE', 'json')
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('draw_bot')
+
+
+def render(bot, fill, prize_filter=""):
+    async def main():
+        guild = FakeGuild()
+        partition = await bot.partitions.get(guild.id)
+        fill(partition.store)
+        browser = bot.ParticipantBrowser(partition, 1, prize_filter)
+        return await browser.render(guild)
+    return asyncio.run(main())
+
+
+def test_long_names_stay_within_limits(bot):
+    def fill(store):
+        for i in range(10):
+            name = "長" * 400 + str(i)
+            store.add(name, 1)
+            for j in range(3):
+                store.join(name, "舊名稱" * 300 + str(j))
+
+    embeds = render(bot, fill)
+    assert sum(len(embed) for embed in embeds) <= MAX_TOTAL
+    for embed in embeds:
+        for field in embed.fields:
+            assert len(field.name) <= MAX_FIELD_NAME
+            assert len(field.value) <= MAX_FIELD_VALUE
+    assert "未顯示" in embeds[-1].footer.text
+
+
+def test_short_page(bot):
+    def fill(store):
+        store.add("A", 2)
+        store.join("A", "甲")
+        store.add("B", 1)
+
+    (embed,) = render(bot, fill)
+    assert [(f.name, f.value) for f in embed.fields] == [
+        ("📦 A（2人）", "👥 參加者：甲"), ("📦 B（1人）", "📭 尚無參加者"),
+    ]
+    assert embed.footer.text == "請遵守抽獎規則！"
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+import pytest
+
+import partitions
+from partitions import PartitionManager
+
+SETTINGS = {
+    "save_max_delay": 0.01, "save_max_batch": 500, "backup_cooldown": 3600,
+    "backup_full_every": 10, "journal_compact_interval": 3600,
+}
+
+
+async def no_backup(filename, data, caption):
+    pass
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return PartitionManager('json', no_backup, SETTINGS, legacy_guild_id=1)
+
+
+def test_concurrent_get_loads_once_off_the_loop(manager, monkeypatch):
+    calls = []
+    original = partitions.PrizePartition.load
+
+    def load(self):
+        calls.append(threading.current_thread() is threading.main_thread())
+        return original(self)
+
+    monkeypatch.setattr(partitions.PrizePartition, "load", load)
+
+    async def main():
+        first, second, event = await asyncio.gather(manager.get(2), manager.get(2), manager.get(2, "e"))
+        assert first is second and first is not event
+        assert await manager.get(2) is first
+        await manager.load_all([2, 3, 3])
+        return len(manager.values())
+
+    assert asyncio.run(main()) == 3
+    assert calls == [False, False, False]
+
+
+def write_legacy():
+    store = partitions.PrizeStore.from_dict({"A": {"participants": ["1", "2"], "winners": 1}})
+    storage_ = partitions.storage.create_storage('json')
+    storage_.save((), storage_.capture(store))
+
+
+def test_legacy_marker_written_after_partition_file(manager):
+    write_legacy()
+    asyncio.run(manager.get(1))
+    assert open(partitions.LEGACY_MARKER, encoding='utf-8').read() == "1"
+    # 重新啟動：從分區檔載入，不再遷移
+    reloaded = PartitionManager('json', no_backup, SETTINGS, legacy_guild_id=1)
+    partition = asyncio.run(reloaded.get(1))
+    assert list(partition.store["A"].participants) == [1, 2]
+
+
+def test_no_marker_when_partition_write_fails(manager, monkeypatch):
+    write_legacy()
+
+    def fail(self, records, snapshot=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(partitions.storage.JsonStorage, "save", fail)
+    partition = asyncio.run(manager.get(1))
+    assert "A" in partition.store
+    assert not partitions.os.path.exists(partitions.LEGACY_MARKER)
@@ -0,0 +1,32 @@
+import pytest
+
+from prize_store import MAX_ID, ParticipantSet, PrizeStore
+
+
+@pytest.mark.parametrize("member", ["1" * 25, str(MAX_ID + 1), "0", "00", "+5", " 7", "5_000", "٣", "x", ""])
+def test_non_id_strings_stay_legacy(member):
+    participants = ParticipantSet([member])
+    assert list(participants) == [member]
+    assert participants.legacy == [member]
+    assert member in participants
+    assert participants.discard(member)
+    assert not participants
+
+
+def test_id_strings_and_ints():
+    participants = ParticipantSet(["123", str(MAX_ID), 456])
+    assert list(participants) == [123, MAX_ID, 456]
+    assert "456" in participants and 123 in participants
+    assert participants.legacy == []
+
+
+def test_out_of_range_int_is_kept_as_text():
+    participants = ParticipantSet([0, MAX_ID + 1])
+    assert participants.legacy == ["0", str(MAX_ID + 1)]
+
+
+def test_from_dict_with_long_numeric_name():
+    # 超出 int64 的數字名稱不能讓整份檔案載入失敗
+    store = PrizeStore.from_dict({"A": {"participants": ["1" * 25, "42"], "winners": 1}})
+    assert list(store["A"].participants) == [42, "1" * 25]
+    assert PrizeStore.from_rows(store.rows(), store.next_id).to_dict() == store.to_dict()
@@ -0,0 +1,22 @@
+from prize_store import PrizeStore
+from restore import plan
+
+
+def make_store(data):
+    return PrizeStore.from_dict({name: {"participants": ids, "winners": 1} for name, ids in data.items()})
+
+
+def test_merge_counts_participants_added_to_existing_prizes():
+    current = make_store({"A": ["1"], "B": ["2"]})
+    rows = current.rows()
+    store, changes = plan(rows, make_store({"A": ["5"], "C": ["7", "8"]}), 'merge', current.next_id)
+    assert list(store["A"].participants) == [1, 5]
+    assert list(rows[0][2]) == [1]
+    assert (changes.added, changes.removed, changes.joined, changes.left) == (["C"], [], 3, 0)
+
+
+def test_replace_counts_removed_prizes():
+    current = make_store({"A": ["1", "2"], "B": ["3"]})
+    store, changes = plan(current.rows(), make_store({"A": ["2", "4"]}), 'replace', current.next_id)
+    assert list(store) == ["A"]
+    assert (changes.added, changes.removed, changes.joined, changes.left) == ([], ["B"], 1, 2)
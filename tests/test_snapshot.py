@@ -0,0 +1,139 @@
+import array
+import math
+import struct
+import zlib
+
+import pytest
+
+import snapshot
+from prize_store import PrizeStore
+
+
+def make_store():
+    store = PrizeStore()
+    store.add("獎品A", 2)
+    store.add("B", 1, (1700000000.5, 1700003600.0, 123456789012345678))
+    store.add("empty", 3)
+    for user_id in (111, 2 ** 62, 333):
+        store.join("獎品A", user_id)
+    store.leave("獎品A", 333)
+    store.join("B", 444)
+    store["B"].participants.legacy.append("舊名稱")
+    store.pop("empty")
+    store.add("C", 1)
+    return store
+
+
+def write(tmp_path, rows, next_id):
+    path = tmp_path / "prizes.snap"
+    with open(path, "wb") as f:
+        snapshot.dump(rows, next_id, f)
+    return path
+
+
+def legacy_file(tmp_path, version, prizes):
+    # 以舊版格式手動組出快照檔：prizes 為 [(名稱, 得獎人數, [ID], [舊名稱], 排程)]
+    body = struct.pack('<8sHI', snapshot.MAGIC, version, len(prizes))
+    for name, winners, ids, legacy, schedule in prizes:
+        encoded = name.encode('utf-8')
+        fields = [len(encoded), winners, len(ids), len(legacy)]
+        if version >= 2:
+            close_at, draw_at, channel_id = schedule
+            fields += [math.nan if close_at is None else close_at, math.nan if draw_at is None else draw_at,
+                       channel_id or 0]
+        body += snapshot._PRIZES[version].pack(*fields) + encoded + struct.pack(f'<{len(ids)}q', *ids)
+        for item in legacy:
+            item = item.encode('utf-8')
+            body += struct.pack('<H', len(item)) + item
+    path = tmp_path / f"v{version}.snap"
+    path.write_bytes(body + struct.pack('<I', zlib.crc32(body)))
+    return path
+
+
+def test_round_trip(tmp_path):
+    store = make_store()
+    path = write(tmp_path, store.rows(), store.next_id)
+    assert snapshot.is_binary(path)
+    loaded = snapshot.load(path)
+    assert loaded.to_dict() == store.to_dict()
+    assert loaded.next_id == 5
+    assert loaded["獎品A"].id == 1 and loaded["C"].id == 4
+    assert list(loaded["獎品A"].participants) == [111, 2 ** 62]
+    assert loaded["B"].schedule == (1700000000.5, 1700003600.0, 123456789012345678)
+    assert loaded["C"].schedule == (None, None, None)
+
+
+def test_round_trip_empty(tmp_path):
+    path = write(tmp_path, [], 7)
+    loaded = snapshot.load(path)
+    assert len(loaded) == 0
+    assert loaded.next_id == 7
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_load_older_versions(tmp_path, version):
+    schedule = (1700000000.0, None, 42)
+    path = legacy_file(tmp_path, version, [
+        ("A", 2, [1, 2, 3], ["舊名稱"], schedule),
+        ("B", 1, [], [], (None, None, None)),
+    ])
+    loaded = snapshot.load(path)
+    assert list(loaded) == ["A", "B"]
+    assert list(loaded["A"].participants) == [1, 2, 3, "舊名稱"]
+    assert loaded["A"].winners == 2
+    # 沒有獎品 ID 的舊版依序指派
+    assert (loaded["A"].id, loaded["B"].id, loaded.next_id) == (1, 2, 3)
+    assert loaded["A"].schedule == (schedule if version >= 2 else (None, None, None))
+
+
+def test_truncated_file(tmp_path):
+    store = make_store()
+    data = write(tmp_path, store.rows(), store.next_id).read_bytes()
+    path = tmp_path / "cut.snap"
+    for size in (0, 10, len(data) // 2, len(data) - 1):
+        path.write_bytes(data[:size])
+        with pytest.raises(ValueError):
+            snapshot.load(path)
+
+
+def test_corrupt_crc(tmp_path):
+    store = make_store()
+    path = write(tmp_path, store.rows(), store.next_id)
+    data = bytearray(path.read_bytes())
+    data[20] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="CRC"):
+        snapshot.load(path)
+
+
+def test_counts_beyond_file(tmp_path):
+    # CRC 正確但 ID 數超出檔案範圍
+    path = legacy_file(tmp_path, 1, [("A", 1, [1], [], None)])
+    body = bytearray(path.read_bytes()[:-4])
+    struct.pack_into('<I', body, struct.calcsize('<8sHI') + struct.calcsize('<Hq'), 1000)
+    path.write_bytes(bytes(body) + struct.pack('<I', zlib.crc32(body)))
+    with pytest.raises(ValueError):
+        snapshot.load(path)
+
+
+def test_trailing_data(tmp_path):
+    path = legacy_file(tmp_path, 2, [("A", 1, [1], [], (None, None, None))])
+    body = path.read_bytes()[:-4] + b'\0'
+    path.write_bytes(body + struct.pack('<I', zlib.crc32(body)))
+    with pytest.raises(ValueError, match="多餘"):
+        snapshot.load(path)
+
+
+def test_unknown_version(tmp_path):
+    body = struct.pack('<8sHI', snapshot.MAGIC, 99, 0)
+    path = tmp_path / "v99.snap"
+    path.write_bytes(body + struct.pack('<I', zlib.crc32(body)))
+    with pytest.raises(ValueError, match="版本"):
+        snapshot.load(path)
+
+
+def test_rows_are_copies():
+    store = make_store()
+    rows = store.rows()
+    store.join("獎品A", 999)
+    assert array.array('q', rows[0][2]).tolist() == [111, 2 ** 62]
@@ -0,0 +1,69 @@
+import collections
+import time
+
+
+class SlidingWindowLimiter:
+    """每位使用者在任意 window 秒內最多 limit 次操作（滑動視窗計數）。
+
+    每位使用者只保存 (目前視窗起點, 目前視窗次數, 前一視窗次數)：前一視窗的次數依重疊比例折算，
+    不需要記錄每次操作的時間。超過兩個視窗沒有動作的使用者會被清掉，另以 max_users 限制總筆數。
+    """
+
+    def __init__(self, limit=10, window=10.0, max_users=100000):
+        self.limit = limit
+        self.window = window
+        self.max_users = max_users
+        self.allowed = 0
+        self.throttled = 0
+        self._users = collections.OrderedDict()   # user_id -> [視窗起點, 目前次數, 前一視窗次數]，依最近使用排序
+
+    def __len__(self):
+        return len(self._users)
+
+    def hit(self, user_id, now=None):
+        """記錄一次操作；允許時回傳 0，被限制時回傳建議等待的秒數（被拒絕的操作不計入）。"""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = [now - now % self.window, 0, 0]
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        start, current, previous = state
+        elapsed = now - start
+        if elapsed >= self.window:
+            # 進入新視窗；超過兩個視窗時前一視窗也已歸零
+            shift = int(elapsed // self.window)
+            previous = current if shift == 1 else 0
+            current = 0
+            start += shift * self.window
+            elapsed = now - start
+        weight = 1 - elapsed / self.window
+        if current + previous * weight + 1 > self.limit:
+            state[:] = start, current, previous
+            self.throttled += 1
+            # 前一視窗的比重隨時間下降，估算何時會再有一次額度
+            if previous:
+                excess = current + previous * weight + 1 - self.limit
+                retry_after = min(self.window - elapsed, excess / previous * self.window)
+            else:
+                retry_after = self.window - elapsed
+            return max(retry_after, 0.001)
+        state[:] = start, current + 1, previous
+        self.allowed += 1
+        return 0
+
+    def _expire(self, now):
+        # 最久未使用的排在最前面，遇到仍在兩個視窗內的使用者就停止
+        users = self._users
+        horizon = now - 2 * self.window
+        while users:
+            user_id, state = next(iter(users.items()))
+            if state[0] > horizon:
+                break
+            users.popitem(last=False)
+
+    def stats(self):
+        return {"users": len(self._users), "allowed": self.allowed, "throttled": self.throttled}